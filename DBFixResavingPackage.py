@@ -1,9 +1,27 @@
 # v1.0.7
+import io
 import os
+import sys
+import csv
+import json
+import glob
+import gzip
+import hashlib
+import datetime
+import urllib.request
 import re
+import sqlite3
+import shutil
 import subprocess
-from typing import Set, Optional, List, Dict
-from dataclasses import dataclass
+import time
+import cProfile
+import argparse
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from typing import Set, Optional, List, Dict, Iterable, Iterator, TextIO, Tuple, BinaryIO
+from dataclasses import dataclass, replace
 
 def print_header():
     """Print header with important setup instructions."""
@@ -30,33 +48,723 @@ def print_header():
     print("=" * 80)
     print()
 
+STRING_ASSET_MARKER = 'String asset reference "None"'
+ERROR_ANCHOR = 'LogStreaming:Error'
+NAMETOLOAD_ANCHOR = ' NameToLoad: '
+# Written by the server while shutting down, after which game.db can be cleaned
+SERVER_STOP_MARKER = 'LogExit: Exiting.'
+TIMESTAMP_RE = re.compile(r'\[\d+\.\d+\.\d+-\d+\.\d+\.\d+\.\d+\]')
+# Lines re-scanned before a byte range so the 5-line chunk window and the
+# 3-line NameToLoad window start in the same state as a serial scan
+OVERLAP_LINES = 8
+# Bytes at the start of the log hashed to notice rotation or truncation
+CHECKPOINT_HEAD_SIZE = 64 * 1024
+# Pragmas used by the in-process engine while the cleanup runs
+SQLITE_TUNING_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -262144;",  # 256 MB page cache
+    "PRAGMA temp_store = MEMORY;",
+]
+# Post-cleanup compaction strategies; "auto" and "vacuum_into" are decided/handled by the in-process engine
+COMPACTION_SQL = {
+    "none": [],
+    "incremental": ["PRAGMA incremental_vacuum;"],
+    "vacuum": ["VACUUM;"],
+}
+INTEGRITY_SQL = {
+    "quick": ["PRAGMA quick_check;"],
+    "full": ["PRAGMA integrity_check;"],
+    "none": [],
+}
+# Pages copied per step of the online backup API, between progress updates
+BACKUP_STEP_PAGES = 4096
+# Dry runs time at most this many DELETEs per table and extrapolate the rest
+DRY_RUN_SAMPLE_STATEMENTS = 25
+# Rough cost of removing one row incl. index upkeep, measured with benchmark.py
+ROW_DELETE_SECONDS = 10e-6
+# Tables touched by generate_sql, in delete order
+CLEANUP_TABLES = ["buildable_health", "buildings", "properties", "actor_position"]
+# Columns that tie a row to an object, in order of preference; the graph plan
+# only uses owner_id for tables without object_id (e.g. item_inventory), since
+# buildings.owner_id is the owning player or guild rather than a containing object
+ORPHAN_KEY_COLUMNS = ("object_id", "owner_id")
+# Known tables whose object is in another column; follower_markers.owner_id is the player, follower_id the thrall
+ORPHAN_KEY_OVERRIDES = {"follower_markers": "follower_id"}
+# Side file next to game.db remembering which blueprints were cleaned up
+# (verified_orphans: blueprints found without objects while game.db had the given fingerprint)
+ORPHAN_CACHE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS known_orphans "
+    "(path TEXT PRIMARY KEY, cleaned_at TEXT, rows_removed INTEGER, last_checked TEXT);"
+    "CREATE TABLE IF NOT EXISTS verified_orphans (path TEXT PRIMARY KEY, fingerprint TEXT);"
+)
+# Rotated logs (ConanSandbox-backup-*.log) may also be gzip or zstd compressed
+LOG_EXTENSIONS = ('.log', '.gz', '.zst')
+COMPRESSED_LOG_EXTENSIONS = ('.gz', '.zst')
+
 @dataclass
 class Config:
     input_file: str = "ConanSandbox.log"
     output_file: str = "CleanUpScript.sql"
     database_file: str = "game.db"
     sqlite_exe: str = "sqlite3.exe"
+    sql_engine: str = "python"  # "python" runs in-process, "sqlite3.exe" pipes the script to sqlite3.exe
+    cleanup_plan: str = "set"  # "set" resolves orphan ids once, "per_blueprint" is the original 4 DELETEs per path,
+                               # "graph" also cleans every other object-keyed table
+    dry_run_report: Optional[str] = None  # Write a JSON impact report instead of modifying game.db
+    batch_size: int = 0  # > 0 deletes orphans in committed batches of this many object ids
+    batch_max_seconds: float = 2.0  # Batches slower than this are halved to keep the write lock short
+    wal_checkpoint_batches: int = 10  # Checkpoint the WAL every this many batches
+    compaction: str = "auto"  # auto, none, incremental, vacuum or vacuum_into
+    integrity_check: str = "quick"  # quick, full or none
+    min_free_ratio: float = 0.10  # "auto" skips compaction below this share of free pages
+    backup_dir: Optional[str] = None  # Snapshot game.db here before modifying it
+    backup_compress: bool = False  # gzip the snapshot
+    backup_keep: int = 3  # Number of snapshots kept in backup_dir
     error_patterns: Dict[str, str] = None
     selected_pattern: str = "standard_error"  # Default pattern
+    read_buffer_size: int = 1024 * 1024  # Log is streamed, never read whole
+    workers: int = 1  # > 1 scans large logs in parallel byte ranges
+    parallel_chunk_size: int = 16 * 1024 * 1024  # Each worker holds one chunk in memory
+    checkpoint_file: Optional[str] = None  # Resume log scans from the last scanned offset
+    metrics_file: Optional[str] = None  # Write per-stage timings and counters (.json or .csv)
+    profile_stages: Optional[List[str]] = None  # Run these stages (or "all") under cProfile
+    interactive: bool = True  # False never prompts: files must exist and the cleanup runs unconfirmed
+    pending_file: str = "pending-blueprints.json"  # Queue of blueprints found by watch mode
+    watch_interval: float = 2.0  # Seconds between polls of the log in watch mode
+    apply_on_stop: bool = False  # Watch mode cleans up the queue as soon as the server stops
+    release_timeout: float = 300.0  # Seconds apply-on-stop waits for the server to release game.db
+    orphan_cache: bool = True  # Skip blueprints without objects in game.db and record cleaned ones in game.db-orphans
+    consolidate_paths: bool = True  # Drop paths already covered by a shorter path that is their prefix
+    modlist_file: Optional[str] = None  # Clean whole /Game/Mods/<folder>/ of mods missing from this modlist.txt
+    group_mods: Optional[List[str]] = None  # Mod folders the user wants cleaned up as a whole
 
     def __post_init__(self):
         self.error_patterns = {
             'standard_error': r'LogStreaming:Error: Couldn\'t find file for package (/Game/(?:Mods|ModsShared)/.*?) requested by async loading code\.',
             'async_loading': r'LogStreaming:Error: Couldn\'t find file for package (/Game/(?:Mods|ModsShared)/.*?) requested by async loading code\.',
-            # Updated to match exact C# pattern
+            # Updated to match exact C# pattern, matched line by line in LogScanner.match_nametoload
             'nametoload': r'\[\d+\.\d+\.\d+-\d+\.\d+\.\d+\.\d+\].* NameToLoad: (.*)\n.*\n\[\d+\.\d+\.\d+-\d+\.\d+\.\d+\.\d+\].* String asset reference \"None\".*slow\.'
         }
 
+class LogScanner:
+    """Single-pass matcher for the line based error patterns.
+
+    Lines are fed one at a time and every hit is attributed to its pattern name.
+    Only the last 5 lines since the previous 'String asset reference "None"'
+    marker are kept, which is all the standard_error chunk method looks at, and
+    the last 2 lines for the NameToLoad triple.
+    """
+
+    def __init__(self, error_patterns: Dict[str, str], pattern_names: Iterable[str]):
+        pattern_names = list(pattern_names)
+        self.chunk_pattern = None
+        if 'standard_error' in pattern_names:
+            self.chunk_pattern = re.compile(error_patterns['standard_error'])
+        self.line_patterns = [
+            (name, re.compile(error_patterns[name]))
+            for name in pattern_names
+            if name not in ('standard_error', 'nametoload')
+        ]
+        self.match_names = 'nametoload' in pattern_names
+        self.window = deque([""], maxlen=5)
+        self.name_window = deque(maxlen=2)
+        self.blueprint_paths: Set[str] = set()
+        self.error_sources: Dict[str, int] = {name: 0 for name in pattern_names}
+        self.lines_scanned = 0
+
+    def add_blueprint(self, pattern_name: str, blueprint_path: str) -> None:
+        self.blueprint_paths.add(blueprint_path)
+        self.error_sources[pattern_name] += 1
+
+    @staticmethod
+    def nametoload_target(line: str) -> Optional[str]:
+        """Return the NameToLoad path if the line opens a NameToLoad triple."""
+        index = line.rfind(NAMETOLOAD_ANCHOR)
+        if index < 0 or not TIMESTAMP_RE.search(line, 0, index):
+            return None
+        return line[index + len(NAMETOLOAD_ANCHOR):]
+
+    @staticmethod
+    def closes_nametoload(line: str) -> bool:
+        """True if the line is the timestamped 'String asset reference "None" ... slow.' line.
+
+        The C# regex has the timestamp right after the newline, so it must open the line.
+        """
+        timestamp = TIMESTAMP_RE.match(line)
+        if not timestamp:
+            return False
+        index = line.find(' ' + STRING_ASSET_MARKER, timestamp.end())
+        return index >= 0 and line.find('slow.', index + len(STRING_ASSET_MARKER) + 1) >= 0
+
+    def match_nametoload(self, line: str) -> None:
+        """Line state machine for NameToLoad -> any line -> 'String asset reference "None"'.
+
+        Equivalent to the C# regex without letting '.*' run across lines, so each
+        line is looked at a bounded number of times.
+        """
+        name_window = self.name_window
+        if len(name_window) == 2 and name_window[0] is not None and STRING_ASSET_MARKER in line \
+                and self.closes_nametoload(line):
+            blueprint_path = name_window[0].strip().replace('\r', '')  # Added \r removal like C# version
+            name_window.clear()
+            if blueprint_path:
+                self.add_blueprint('nametoload', blueprint_path)
+            # Like re.finditer, the next match may only start after this one ends
+            line = line[line.rfind('slow.') + len('slow.'):]
+        name_window.append(self.nametoload_target(line) if NAMETOLOAD_ANCHOR in line else None)
+
+    def feed(self, line: str) -> None:
+        """Scan one line (with or without its trailing newline)."""
+        has_newline = line.endswith('\n')
+        if has_newline:
+            line = line[:-1]
+
+        if self.match_names:
+            self.match_nametoload(line)
+
+        # Literal anchor check is far cheaper than running the regex on filler lines
+        if self.line_patterns and ERROR_ANCHOR in line:
+            for pattern_name, pattern in self.line_patterns:
+                for match in pattern.finditer(line):
+                    blueprint_path = match.group(1).strip()
+                    if blueprint_path:
+                        self.add_blueprint(pattern_name, blueprint_path)
+
+        if self.chunk_pattern is None:
+            return
+        window = self.window
+        if STRING_ASSET_MARKER not in line:
+            window[-1] = line
+        else:
+            pieces = line.split(STRING_ASSET_MARKER)
+            window[-1] = pieces[0]
+            for piece in pieces[1:]:
+                for candidate in window:
+                    if ERROR_ANCHOR not in candidate:
+                        continue
+                    match = self.chunk_pattern.search(candidate)
+                    if match:
+                        self.add_blueprint('standard_error', match.group(1).strip())
+                        break
+                window.clear()
+                window.append(piece)
+        if has_newline:
+            window.append("")
+
+    def feed_lines(self, lines: Iterable[str]) -> None:
+        count = 0
+        for count, line in enumerate(lines, 1):
+            self.feed(line)
+        self.lines_scanned += count
+
+    def reset_hits(self) -> None:
+        """Drop hits and line counts collected so far but keep the line windows."""
+        self.blueprint_paths = set()
+        self.error_sources = {name: 0 for name in self.error_sources}
+        self.lines_scanned = 0
+
+def rewind_lines(file: BinaryIO, position: int, count: int, block_size: int = 64 * 1024) -> int:
+    """Return the offset of the line starting `count` lines before `position`.
+
+    `position` must be at the start of a line.
+    """
+    newlines = 0
+    end = position
+    while end > 0:
+        start = max(0, end - block_size)
+        file.seek(start)
+        block = file.read(end - start)
+        index = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            newlines += 1
+            # The first newline found just ends the line before `position`
+            if newlines > count:
+                return start + index + 1
+        end = start
+    return 0
+
+def sql_quote(value: str) -> str:
+    """Quote a string as an SQL literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+SQL_KEYWORDS = {"WHERE", "JOIN", "CROSS", "INNER", "LEFT", "ON", "USING", "GROUP", "ORDER", "LIMIT", "SET", "AS", "NOT", "INDEXED"}
+
+def scanned_tables(sql: str, query_plan: List[str]) -> List[str]:
+    """Tables an EXPLAIN QUERY PLAN reports full scans of, with aliases mapped back to table names.
+
+    Handles 'SCAN a' (SQLite 3.36+) as well as the older 'SCAN TABLE x AS a'.
+    """
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+([\w.]+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        table = table.split('.')[-1]
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    tables = set()
+    for detail in query_plan:
+        words = detail.split()
+        if len(words) < 2 or words[0] != "SCAN":
+            continue
+        name = words[2] if words[1] == "TABLE" and len(words) > 2 else words[1]
+        # Not tables: VALUES lists ('SCAN 3 CONSTANT ROWS', 'SCAN CONSTANT ROW') and subqueries
+        if "CONSTANT" in words or name == "SUBQUERY" or name.startswith("("):
+            continue
+        tables.add(aliases.get(name, name.split('.')[-1]))
+    return sorted(tables)
+
+def prefix_inserts(table: str, paths: Iterable[str], rows_per_statement: int = 100) -> List[str]:
+    """INSERTs filling `table` with `paths`, a bounded number of rows per statement."""
+    paths = sorted(paths)
+    return [
+        f"INSERT OR IGNORE INTO {table} (path) VALUES "
+        + ", ".join(f"({sql_quote(path)})" for path in paths[start:start + rows_per_statement]) + ";"
+        for start in range(0, len(paths), rows_per_statement)
+    ]
+
+def prefix_match_select(prefix_table: str, class_indexed: bool) -> str:
+    """SELECT (id, path) of the actor_position rows whose class starts with a path in `prefix_table`.
+
+    `prefix_table` must be keyed by path and hold no path that starts with
+    another one (see consolidate_prefixes); then the only candidate for a class
+    is the greatest path not above it, found with one index lookup per row.
+    With an index on class each path is a range scan of that index instead.
+    Unlike a chain of ORs this works for any number of paths.
+    """
+    if class_indexed:
+        return (f"SELECT a.id AS id, p.path AS path FROM {prefix_table} p CROSS JOIN actor_position a "
+                "WHERE a.class >= p.path AND a.class < p.path || char(1114111)")
+    return (f"SELECT id, path FROM (SELECT a.id AS id, a.class AS class, "
+            f"(SELECT p.path FROM {prefix_table} p WHERE p.path <= a.class ORDER BY p.path DESC LIMIT 1) AS path "
+            "FROM actor_position a) WHERE class < path || char(1114111)")
+
+def cleanup_deletes(orphan_ids: str) -> List[str]:
+    """One DELETE per cleanup table for the actor ids selected by `orphan_ids`."""
+    return [
+        f"DELETE FROM buildable_health WHERE object_id IN (SELECT object_id FROM buildings WHERE object_id IN (SELECT object_id FROM properties WHERE object_id IN ({orphan_ids})));",
+        f"DELETE FROM buildings WHERE object_id IN (SELECT object_id FROM properties WHERE object_id IN ({orphan_ids}));",
+        f"DELETE FROM properties WHERE object_id IN ({orphan_ids});",
+        f"DELETE FROM actor_position WHERE id IN ({orphan_ids});",
+    ]
+
+def consolidate_prefixes(paths: Iterable[str]) -> List[str]:
+    """Smallest set of class prefixes matching the same rows as `paths`.
+
+    A path starting with another path only matches rows the shorter one
+    already does. Sorting puts every path right after the paths that are its
+    prefixes, so one sweep keeps exactly the shallowest nodes of a prefix trie.
+    """
+    prefixes: List[str] = []
+    for path in sorted(set(paths)):
+        if not prefixes or not path.startswith(prefixes[-1]):
+            prefixes.append(path)
+    return prefixes
+
+def mod_root(blueprint_path: str) -> Optional[str]:
+    """'/Game/Mods/<folder>/' of a path inside a mod; ModsShared is used by many mods and has none."""
+    parts = blueprint_path.split('/')
+    if len(parts) > 4 and parts[1] == 'Game' and parts[2] == 'Mods' and parts[3]:
+        return '/'.join(parts[:4]) + '/'
+    return None
+
+def mod_folder_root(folder: str) -> Optional[str]:
+    """'/Game/Mods/<folder>/' of a mod folder given by name or path, None if it isn't one."""
+    folder = folder.strip().replace('\\', '/').strip('/')
+    if folder.startswith('Game/Mods/'):
+        folder = folder[len('Game/Mods/'):]
+    if not folder or '/' in folder:
+        return None
+    return f"/Game/Mods/{folder}/"
+
+def read_modlist(modlist_file: str) -> List[str]:
+    """Lower-case .pak names (without extension) listed in a server's modlist.txt."""
+    names = []
+    with open(modlist_file, 'r', encoding='utf-8', errors='ignore') as file:
+        for line in file:
+            line = line.strip().lstrip('*')
+            if line and not line.startswith('#'):
+                names.append(os.path.splitext(line.replace('\\', '/').rsplit('/', 1)[-1])[0].lower())
+    return names
+
+def has_class_index(connection: sqlite3.Connection) -> bool:
+    """True if an index on actor_position starts with the class column."""
+    for index in connection.execute("PRAGMA index_list(actor_position);").fetchall():
+        columns = connection.execute(f"PRAGMA index_info({sql_quote(index[1])});").fetchall()
+        if columns and columns[0][2] == "class":
+            return True
+    return False
+
+def find_orphan_tables(connection: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """(table, key column) of every table holding rows of objects, in delete order.
+
+    The schema is read from sqlite_master in one query. Tables with foreign keys
+    come before the tables they reference, owner_id keyed tables (contents of
+    an object) before the others, and actor_position is always last.
+    """
+    columns: Dict[str, Set[str]] = {}
+    references: Dict[str, Set[str]] = {}
+    for table, column, parent in connection.execute(
+            "SELECT m.name, c.name, NULL FROM sqlite_master m, pragma_table_info(m.name) c "
+            "WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%' "
+            "UNION ALL SELECT m.name, NULL, f.\"table\" FROM sqlite_master m, pragma_foreign_key_list(m.name) f "
+            "WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%';"):
+        columns.setdefault(table, set())
+        if column:
+            columns[table].add(column.lower())
+        if parent:
+            references.setdefault(table, set()).add(parent)
+
+    keyed = {}
+    for table, table_columns in columns.items():
+        # Names are used unquoted in the script, like the fixed cleanup tables
+        if table == "actor_position" or not re.fullmatch(r'\w+', table):
+            continue
+        key = ORPHAN_KEY_OVERRIDES.get(table.lower())
+        if key not in table_columns:
+            key = next((column for column in ORPHAN_KEY_COLUMNS if column in table_columns), None)
+        if key:
+            keyed[table] = key
+
+    remaining = sorted(keyed, key=lambda table: (keyed[table] != "owner_id", table))
+    ordered = []
+    while remaining:
+        # A table can go once no remaining table references it; a cycle just takes the first one
+        table = next((table for table in remaining
+                      if not any(table in references.get(other, ()) for other in remaining if other != table)),
+                     remaining[0])
+        remaining.remove(table)
+        ordered.append((table, keyed[table]))
+    return ordered + [("actor_position", "id")]
+
+def connect_readonly(database_file: str) -> sqlite3.Connection:
+    """Open a database so that nothing in it can be modified (temp tables still work)."""
+    uri = "file:" + urllib.request.pathname2url(os.path.abspath(database_file)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+def database_fingerprint(database_file: str) -> str:
+    """Size, modification time and inode of game.db and its WAL, changed by any write or file swap."""
+    parts = []
+    for file in (database_file, database_file + "-wal"):
+        if os.path.exists(file):
+            stat = os.stat(file)
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}")
+    return "/".join(parts)
+
+def copy_database(source_file: str, target_file: str, label: str) -> float:
+    """Copy a database page by page with the online backup API and return the seconds taken."""
+    def progress(status: int, remaining: int, total: int) -> None:
+        done = total - remaining
+        print(f"\r{label}: {done:,}/{total:,} pages ({done / total:.0%})" if total else "", end="", flush=True)
+
+    source = sqlite3.connect(source_file)
+    target = sqlite3.connect(target_file)
+    try:
+        start = time.perf_counter()
+        source.backup(target, pages=BACKUP_STEP_PAGES, progress=progress)
+        seconds = time.perf_counter() - start
+    finally:
+        target.close()
+        source.close()
+    print()
+    return seconds
+
+def open_log_source(log_file: str, buffer_size: int = 1024 * 1024) -> TextIO:
+    """Open a plain, .gz or .zst log as a stream of text lines without unpacking it to disk."""
+    if log_file.endswith('.gz'):
+        return gzip.open(log_file, 'rt', encoding='utf-8', errors='ignore')
+    if log_file.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"Reading '{log_file}' needs the zstandard package (pip install zstandard)")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(log_file, 'rb'), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(io.BufferedReader(stream, buffer_size), encoding='utf-8', errors='ignore')
+    return open(log_file, 'r', encoding='utf-8', errors='ignore', buffering=buffer_size)
+
+def expand_log_sources(log_source: str) -> List[str]:
+    """Resolve a log file, a directory of logs or a glob into a sorted list of log files."""
+    if os.path.isdir(log_source):
+        return sorted(
+            os.path.join(log_source, name) for name in os.listdir(log_source)
+            if name.endswith(LOG_EXTENSIONS) and os.path.isfile(os.path.join(log_source, name))
+        )
+    if glob.has_magic(log_source):
+        return sorted(path for path in glob.glob(log_source) if os.path.isfile(path))
+    return [log_source] if os.path.isfile(log_source) else []
+
+def scan_log_file(log_file: str, error_patterns: Dict[str, str], pattern_names: List[str],
+                  buffer_size: int) -> Tuple[Set[str], Dict[str, int], int]:
+    """Stream a whole (possibly compressed) log; runs in worker processes."""
+    scanner = LogScanner(error_patterns, pattern_names)
+    with open_log_source(log_file, buffer_size) as lines:
+        scanner.feed_lines(lines)
+    return scanner.blueprint_paths, scanner.error_sources, scanner.lines_scanned
+
+def decode_log_bytes(data: bytes) -> io.StringIO:
+    """Decode log bytes into lines exactly like the text-mode log reader does."""
+    return io.StringIO(data.decode('utf-8', errors='ignore'), newline=None)
+
+def split_log_ranges(log_file: str, chunk_size: int, start: int = 0,
+                     end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split [start, end) of a log into byte ranges of about chunk_size that start at line boundaries."""
+    if end is None:
+        end = os.path.getsize(log_file)
+    ranges = []
+    with open(log_file, 'rb') as file:
+        while start < end:
+            file.seek(min(start + chunk_size, end))
+            if file.tell() < end:
+                file.readline()
+            range_end = min(file.tell(), end)
+            ranges.append((start, range_end))
+            start = range_end
+    return ranges
+
+def complete_lines_end(log_file: str, block_size: int = 64 * 1024) -> int:
+    """Offset just past the last newline, so a line still being written is left for later."""
+    with open(log_file, 'rb') as file:
+        end = file.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - block_size)
+            file.seek(start)
+            index = file.read(end - start).rfind(b'\n')
+            if index >= 0:
+                return start + index + 1
+            end = start
+    return 0
+
+def log_fingerprint(log_file: str, size: int) -> str:
+    """Hash of the first `size` bytes of a log."""
+    with open(log_file, 'rb') as file:
+        return hashlib.sha256(file.read(size)).hexdigest()
+
+def log_rotated(log_file: str, offset: int, head_size: int, head_sha256: str) -> bool:
+    """True if the log was rotated or truncated since it was read up to `offset`."""
+    return os.path.getsize(log_file) < offset or log_fingerprint(log_file, head_size) != head_sha256
+
+def find_rotated_log(log_file: str, head_size: int, head_sha256: str) -> Optional[str]:
+    """Find the renamed file (e.g. ConanSandbox-backup-*.log) that a rotated log now lives in."""
+    directory = os.path.dirname(os.path.abspath(log_file))
+    for name in sorted(os.listdir(directory), reverse=True):
+        path = os.path.join(directory, name)
+        if name.endswith('.log') and os.path.isfile(path) and not os.path.samefile(path, log_file) \
+                and os.path.getsize(path) >= head_size and log_fingerprint(path, head_size) == head_sha256:
+            return path
+    return None
+
+def database_holders(database_file: str) -> Optional[List[int]]:
+    """PIDs of other processes with game.db or its journal files open.
+
+    Uses psutil if installed, otherwise /proc. None if that can't be found
+    out, e.g. when some processes can't be inspected and none of the others
+    holds the file.
+    """
+    targets = {os.path.normcase(os.path.realpath(database_file + suffix))
+               for suffix in ("", "-wal", "-shm", "-journal")}
+    holders = set()
+    uncertain = False
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        for process in psutil.process_iter():
+            if process.pid == os.getpid():
+                continue
+            try:
+                if any(os.path.normcase(file.path) in targets for file in process.open_files()):
+                    holders.add(process.pid)
+            except psutil.NoSuchProcess:
+                continue
+            except psutil.AccessDenied:
+                uncertain = True
+    elif os.path.isdir('/proc/self/fd'):
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                descriptors = os.listdir(f'/proc/{pid}/fd')
+            except PermissionError:
+                uncertain = True
+                continue
+            except OSError:  # Process exited
+                continue
+            for descriptor in descriptors:
+                try:
+                    if os.readlink(f'/proc/{pid}/fd/{descriptor}') in targets:
+                        holders.add(int(pid))
+                        break
+                except OSError:
+                    continue
+    else:
+        return None
+    if holders or not uncertain:
+        return sorted(holders)
+    return None
+
+def is_wal_database(database_file: str) -> bool:
+    """True if the database header says WAL mode (read directly, opening it would create -shm)."""
+    with open(database_file, 'rb') as file:
+        header = file.read(20)
+    return len(header) == 20 and header[18] == 2
+
+def wait_for_release(database_file: str, timeout: float, interval: float = 1.0) -> Optional[bool]:
+    """Wait up to `timeout` seconds until the server has closed game.db.
+
+    True once no other process has it open (for WAL databases also when the
+    -wal and -shm files are gone, which SQLite does on the last close). None
+    if closing can't be detected here; then only an exclusive lock, i.e. no
+    transaction in progress, has been checked. False on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        holders = database_holders(database_file)
+        if holders is None and is_wal_database(database_file):
+            if not any(os.path.exists(database_file + suffix) for suffix in ("-wal", "-shm")):
+                holders = []
+        elif holders is None:
+            break
+        if holders == []:
+            break
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+    connection = sqlite3.connect(database_file, timeout=max(deadline - time.monotonic(), 0), isolation_level=None)
+    try:
+        connection.execute("BEGIN EXCLUSIVE;")
+        connection.execute("ROLLBACK;")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+    return holders == [] or None
+
+def scan_log_range(log_file: str, start: int, end: int, error_patterns: Dict[str, str],
+                   pattern_names: List[str]) -> Tuple[Set[str], Dict[str, int], int]:
+    """Scan the lines starting inside [start, end) of a log file.
+
+    Runs in worker processes, so it only takes and returns picklable values.
+    """
+    scanner = LogScanner(error_patterns, pattern_names)
+    with open(log_file, 'rb') as file:
+        position = rewind_lines(file, start, OVERLAP_LINES) if start else 0
+        file.seek(position)
+        overlap = file.read(start - position)
+        scanner.feed_lines(decode_log_bytes(overlap))
+        scanner.reset_hits()
+        scanner.feed_lines(decode_log_bytes(file.read(end - start)))
+    return scanner.blueprint_paths, scanner.error_sources, scanner.lines_scanned
+
+def peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """Peak resident memory of this process (or its largest finished child), None if unknown."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        if children:
+            return None
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KB elsewhere
+
+def cpu_seconds() -> float:
+    """CPU time of this process plus its finished worker processes."""
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+class StageMetrics:
+    """Wall/CPU time, peak memory and counters of each processing stage.
+
+    Stages can also be run under cProfile; their stats are dumped to
+    profile-<stage>.prof in the working directory.
+    """
+
+    def __init__(self, profile_stages: Iterable[str] = ()):
+        self.profile_stages = set(profile_stages)
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        """Measure the enclosed block; counters added to the yielded dict are recorded with it."""
+        record = {"stage": name}
+        profiler = None
+        if name in self.profile_stages or "all" in self.profile_stages:
+            profiler = cProfile.Profile()
+        wall_start = time.perf_counter()
+        cpu_start = cpu_seconds()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(f"profile-{name}.prof")
+                print(f"Profile of stage '{name}' written to: 'profile-{name}.prof' (view with: python -m pstats)")
+            # Peak memory is a high-water mark, so it is the peak up to the end of this stage
+            record.update(
+                wall_seconds=round(time.perf_counter() - wall_start, 3),
+                cpu_seconds=round(cpu_seconds() - cpu_start, 3),
+                peak_rss_bytes=peak_rss_bytes(),
+                workers_peak_rss_bytes=peak_rss_bytes(children=True),
+            )
+            self.stages.append(record)
+
+    def write(self, metrics_file: str) -> None:
+        """Write the stages as JSON, or as CSV with one row per stage if the file ends in .csv."""
+        if metrics_file.lower().endswith('.csv'):
+            rows = []
+            for record in self.stages:
+                row = {}
+                for key, value in record.items():
+                    if isinstance(value, dict):  # matches per pattern, rows per table
+                        row.update((f"{key}.{name}", count) for name, count in value.items())
+                    else:
+                        row[key] = value
+                rows.append(row)
+            fields = list(dict.fromkeys(key for row in rows for key in row))
+            with open(metrics_file, 'w', encoding='utf-8', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(metrics_file, 'w', encoding='utf-8') as file:
+                json.dump({
+                    "created": datetime.datetime.now().isoformat(timespec='seconds'),
+                    "stages": self.stages,
+                }, file, indent=2)
+        print(f"Stage metrics written to: '{metrics_file}'")
+
 class BlueprintFixer:
     def __init__(self, config: Config):
         self.config = config
         self.blueprint_paths: Set[str] = set()
-        self.sql_statements: List[str] = []
+        self.sql_statements: List[str] = []  # Cleanup statements, run in one transaction
+        self.maintenance_statements: List[str] = []  # Run after the cleanup is committed
         self.error_sources: Dict[str, int] = {
             'standard_error': 0,
             'async_loading': 0,
             'nametoload': 0
         }
+        self.file_sources: Dict[str, int] = {}  # Matches per log file when scanning several
+        self.statement_results: List[Tuple[str, int]] = []  # (statement, affected rows)
+        self.database_updated = False
+        self.swap_allowed = True  # vacuum_into may replace game.db with the compacted copy
+        self.maintenance_error: Optional[str] = None  # Compaction/check error after a committed cleanup
+        self.orphans_checked = True  # False when the orphan cache was trusted without reading game.db
+        self.actor_rows: Dict[str, Optional[int]] = {}  # actor_position rows per blueprint found by the probe
+        self.plan_paths: List[str] = []  # Class prefixes the cleanup matches, after consolidation
+        self.grouped_mods: List[str] = []  # Mod folders cleaned up as a whole
+        self.orphan_tables: List[Tuple[str, str]] = []  # (table, key column) cleaned by the graph plan
+        self.bytes_scanned = 0
+        self.lines_scanned = 0
+        self.metrics = StageMetrics(config.profile_stages or [])
 
     def find_log_file(self) -> bool:
         """Find ConanSandbox.log and update config path."""
@@ -208,18 +916,25 @@ class BlueprintFixer:
 
     def validate_files(self) -> bool:
         """Validate required files existence."""
-        if not os.path.exists(self.config.input_file):
+        if not expand_log_sources(self.config.input_file):
             print(f"Log file '{self.config.input_file}' not found in the current directory.")
-            if not self.find_log_file():
+            if not self.config.interactive or not self.find_log_file():
                 return False
             
         # Check for sqlite3.exe and try to find it if missing
-        if not os.path.exists(self.config.sqlite_exe):
+        if self.config.sql_engine == "sqlite3.exe" and not os.path.exists(self.config.sqlite_exe):
+            if not self.config.interactive:
+                print(f"SQLite executable '{self.config.sqlite_exe}' not found.")
+                return False
             if not self.find_sqlite_exe():
                 return False
 
         # Check for game.db and try to find it if missing
         if not os.path.exists(self.config.database_file):
+            # Never guess which game.db to modify without someone to confirm it
+            if not self.config.interactive:
+                print(f"Database file '{self.config.database_file}' not found.")
+                return False
             if not self.find_database():
                 return False
                 
@@ -227,6 +942,10 @@ class BlueprintFixer:
 
     def choose_pattern(self) -> bool:
         """Let user choose which error pattern to use."""
+        if not self.config.interactive:
+            print(f"Using pattern: {self.config.selected_pattern}")
+            return True
+
         print("\nAvailable error patterns:")
         print("1. Standard Error Pattern (String asset reference None chunk method)")
         print("2. Async Loading Pattern (Using direct matching. More comprehensive detection)")
@@ -236,9 +955,11 @@ class BlueprintFixer:
         
         choice = input("\nChoose pattern (1-5) [Press Enter for default]: ").strip()
         
-        if not choice:  # If user just presses Enter
-            self.config.selected_pattern = "standard_error"
-            print("Using default pattern (Standard Error with original method)")
+        if not choice:  # If user just presses Enter, keep the default or the --pattern choice
+            if self.config.selected_pattern == "standard_error":
+                print("Using default pattern (Standard Error with original method)")
+            else:
+                print(f"Using pattern: {self.config.selected_pattern}")
             return True
             
         if choice == "1":
@@ -258,65 +979,284 @@ class BlueprintFixer:
         print(f"Using pattern: {self.config.selected_pattern}")
         return True
 
-    def extract_blueprints(self, content: str) -> None:
-        """Extract blueprint paths from log content using selected pattern and method."""
-        if self.config.selected_pattern == "standard_error":
-            # Use old chunking method for standard_error
-            chunks = content.split('String asset reference "None"')
-            for chunk in chunks[:-1]:
-                lines = chunk.split('\n')
-                for line in lines[-5:]:
-                    match = re.search(self.config.error_patterns['standard_error'], line)
-                    if match:
-                        self.blueprint_paths.add(match.group(1).strip())
-                        self.error_sources['standard_error'] += 1
-                        break
-        elif self.config.selected_pattern == "nametoload":
-            # Use exact C# matching method for nametoload
-            matches = re.finditer(self.config.error_patterns['nametoload'], content, re.MULTILINE | re.DOTALL)
-            for match in matches:
-                blueprint_path = match.group(1).strip().replace('\r', '')  # Added \r removal like C# version
-                if blueprint_path:
-                    self.blueprint_paths.add(blueprint_path)
-                    self.error_sources['nametoload'] += 1
+    def open_log(self, log_file: str) -> TextIO:
+        """Open a log for streaming through a bounded read buffer."""
+        return open_log_source(log_file, self.config.read_buffer_size)
+
+    def merge_scan(self, blueprint_paths: Set[str], error_sources: Dict[str, int], lines_scanned: int = 0) -> None:
+        """Merge a scan's hits into the fixer's totals."""
+        self.blueprint_paths.update(blueprint_paths)
+        self.lines_scanned += lines_scanned
+        for pattern_name, count in error_sources.items():
+            self.error_sources[pattern_name] += count
+
+    def selected_pattern_names(self) -> List[str]:
+        """Pattern names covered by the selected pattern mode."""
+        if self.config.selected_pattern == "all":
+            return list(self.config.error_patterns)
+        if self.config.selected_pattern == "standard_async":
+            return ['async_loading', 'standard_error']
+        return [self.config.selected_pattern]
+
+    def extract_blueprints(self, log_file: str) -> None:
+        """Extract blueprint paths from the log file using selected pattern and method."""
+        compressed = log_file.endswith(COMPRESSED_LOG_EXTENSIONS)
+        if self.config.checkpoint_file and not compressed:
+            self.extract_blueprints_incremental(log_file)
+            return
+
+        if self.config.workers > 1 and not compressed \
+                and os.path.getsize(log_file) > self.config.parallel_chunk_size:
+            self.extract_blueprints_parallel(log_file)
+            return
+
+        scanner = LogScanner(self.config.error_patterns, self.selected_pattern_names())
+        with self.open_log(log_file) as lines:
+            scanner.feed_lines(lines)
+        self.bytes_scanned += os.path.getsize(log_file)  # Compressed bytes for .gz/.zst
+        self.merge_scan(scanner.blueprint_paths, scanner.error_sources, scanner.lines_scanned)
+
+    def extract_blueprints_from_sources(self, log_source: str) -> None:
+        """Scan a log file, a directory of rotated logs or a glob into one blueprint set."""
+        log_files = expand_log_sources(log_source)
+        if len(log_files) <= 1:
+            for log_file in log_files:
+                self.extract_blueprints(log_file)
+            return
+
+        print(f"Scanning {len(log_files)} log files...")
+        if self.config.checkpoint_file:
+            print("Warning: --checkpoint only applies to a single log file, scanning all files in full.")
+        pattern_names = self.selected_pattern_names()
+        workers = self.config.workers if self.config.workers > 1 else os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(log_files))) as executor:
+            futures = {
+                log_file: executor.submit(scan_log_file, log_file, self.config.error_patterns,
+                                          pattern_names, self.config.read_buffer_size)
+                for log_file in log_files
+            }
+            for log_file, future in futures.items():
+                blueprint_paths, error_sources, lines_scanned = future.result()
+                self.merge_scan(blueprint_paths, error_sources, lines_scanned)
+                self.bytes_scanned += os.path.getsize(log_file)
+                self.file_sources[log_file] = sum(error_sources.values())
+
+    def extract_blueprints_parallel(self, log_file: str, start: int = 0, end: Optional[int] = None) -> None:
+        """Scan line-aligned byte ranges of the log, across a process pool if workers > 1."""
+        ranges = split_log_ranges(log_file, self.config.parallel_chunk_size, start, end)
+        self.bytes_scanned += sum(range_end - range_start for range_start, range_end in ranges)
+        pattern_names = self.selected_pattern_names()
+        if self.config.workers <= 1 or len(ranges) <= 1:
+            for range_start, range_end in ranges:
+                self.merge_scan(*scan_log_range(log_file, range_start, range_end,
+                                                self.config.error_patterns, pattern_names))
+            return
+
+        print(f"Scanning {len(ranges)} log chunks with {self.config.workers} workers...")
+        with ProcessPoolExecutor(max_workers=self.config.workers) as executor:
+            futures = [
+                executor.submit(scan_log_range, log_file, range_start, range_end,
+                                self.config.error_patterns, pattern_names)
+                for range_start, range_end in ranges
+            ]
+            for future in futures:
+                self.merge_scan(*future.result())
+
+    def load_checkpoint(self, log_file: str) -> int:
+        """Restore hits from the checkpoint and return the offset to resume scanning at.
+
+        Returns 0 when there is no usable checkpoint, e.g. after log rotation.
+        """
+        try:
+            with open(self.config.checkpoint_file, 'r', encoding='utf-8') as file:
+                checkpoint = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint '{self.config.checkpoint_file}': {str(e)}")
+            return 0
+
+        offset = checkpoint.get('offset', 0)
+        if (checkpoint.get('log_file') != os.path.abspath(log_file)
+                or checkpoint.get('selected_pattern') != self.config.selected_pattern):
+            print("Checkpoint is for a different log or pattern, rescanning from the start.")
+            return 0
+        if log_rotated(log_file, offset, checkpoint['head_size'], checkpoint['head_sha256']):
+            print("Log was rotated or truncated since the last run, rescanning from the start.")
+            return 0
+
+        self.merge_scan(set(checkpoint['blueprint_paths']), checkpoint['error_sources'])
+        return offset
+
+    def save_checkpoint(self, log_file: str, offset: int) -> None:
+        head_size = min(offset, CHECKPOINT_HEAD_SIZE)
+        checkpoint = {
+            'log_file': os.path.abspath(log_file),
+            'selected_pattern': self.config.selected_pattern,
+            'offset': offset,
+            'head_size': head_size,
+            'head_sha256': log_fingerprint(log_file, head_size),
+            'blueprint_paths': sorted(self.blueprint_paths),
+            'error_sources': self.error_sources,
+        }
+        temp_file = self.config.checkpoint_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file, indent=2)
+        os.replace(temp_file, self.config.checkpoint_file)
+
+    def extract_blueprints_incremental(self, log_file: str) -> None:
+        """Scan only the bytes appended since the checkpoint and merge them in."""
+        offset = self.load_checkpoint(log_file)
+        end = complete_lines_end(log_file)
+        if offset:
+            print(f"Resuming log scan at byte {offset:,} ({max(0, end - offset):,} new bytes)")
+        self.extract_blueprints_parallel(log_file, offset, end)
+        self.save_checkpoint(log_file, max(offset, end))
+
+    def load_pending(self) -> dict:
+        """Load the pending-blueprint queue kept by watch mode, or start an empty one."""
+        try:
+            with open(self.config.pending_file, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable pending queue '{self.config.pending_file}': {str(e)}")
+        return {'blueprints': {}}
+
+    def save_pending(self, pending: dict) -> None:
+        temp_file = self.config.pending_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as file:
+            json.dump(pending, file, indent=2)
+        os.replace(temp_file, self.config.pending_file)
+
+    def tail_log(self, scanner: LogScanner, log_file: str, offset: int, pending: dict) -> Tuple[int, bool]:
+        """Scan the complete lines appended after `offset` and queue their blueprints.
+
+        Returns the offset after the last complete line and whether the server stopped.
+        """
+        stopped = False
+        with open(log_file, 'rb') as file:
+            while True:
+                file.seek(offset)
+                data = file.read(self.config.parallel_chunk_size)
+                end = data.rfind(b'\n') + 1
+                if not end:  # Nothing new, or a line still being written
+                    break
+                for line in decode_log_bytes(data[:end]):
+                    scanner.feed(line)
+                    if SERVER_STOP_MARKER in line:
+                        stopped = True
+                offset += end
+
+                now = datetime.datetime.now().isoformat(timespec='seconds')
+                for blueprint_path in sorted(scanner.blueprint_paths):
+                    if blueprint_path not in pending['blueprints']:
+                        print(f"Found missing blueprint: {blueprint_path}")
+                        pending['blueprints'][blueprint_path] = {'first_seen': now}
+                    pending['blueprints'][blueprint_path]['last_seen'] = now
+                scanner.reset_hits()
+        return offset, stopped
+
+    def watch_log(self) -> None:
+        """Follow the log as it grows and keep a deduplicated queue of missing blueprints.
+
+        The log is polled, never held open, so the server can still rotate it.
+        Only appended lines are scanned; after a rotation the rest of the old
+        file is drained from its new name before the new log is followed.
+        """
+        log_file = self.config.input_file
+        pending = self.load_pending()
+        offset = 0
+        if (os.path.exists(log_file) and pending.get('log_file') == os.path.abspath(log_file)
+                and pending.get('selected_pattern') == self.config.selected_pattern
+                and not log_rotated(log_file, pending['offset'], pending['head_size'], pending['head_sha256'])):
+            offset = pending['offset']
+        scanner = LogScanner(self.config.error_patterns, self.selected_pattern_names())
+        print(f"Watching '{log_file}' every {self.config.watch_interval}s, "
+              f"{len(pending['blueprints'])} blueprints pending (Ctrl+C to stop)")
+        try:
+            while True:
+                if not os.path.exists(log_file):  # Between the rotation and the server creating a new log
+                    time.sleep(self.config.watch_interval)
+                    continue
+
+                rotated = offset and log_rotated(log_file, offset, pending['head_size'], pending['head_sha256'])
+                if rotated:
+                    rotated_file = find_rotated_log(log_file, pending['head_size'], pending['head_sha256'])
+                    if rotated_file:
+                        # A stop found here is already followed by a restart, so it is not acted on
+                        self.tail_log(scanner, rotated_file, offset, pending)
+                    print("Log was rotated, following the new log from the start.")
+                    scanner = LogScanner(self.config.error_patterns, self.selected_pattern_names())
+                    offset = 0
+
+                previous_offset = offset
+                offset, stopped = self.tail_log(scanner, log_file, offset, pending)
+                if offset != previous_offset or rotated:
+                    pending.update(
+                        log_file=os.path.abspath(log_file),
+                        selected_pattern=self.config.selected_pattern,
+                        offset=offset,
+                        head_size=min(offset, CHECKPOINT_HEAD_SIZE),
+                        head_sha256=log_fingerprint(log_file, min(offset, CHECKPOINT_HEAD_SIZE)),
+                    )
+                    self.save_pending(pending)
+
+                if stopped:
+                    print(f"Server stopped, {len(pending['blueprints'])} blueprints pending.")
+                    if self.config.apply_on_stop and pending['blueprints']:
+                        self.apply_on_stop(pending)
+                time.sleep(self.config.watch_interval)
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+
+    def apply_on_stop(self, pending: dict) -> None:
+        """Apply the queue once the stopped server has released game.db; a failure keeps the watcher running."""
+        database_file = self.config.database_file
+        if os.path.exists(database_file):
+            print("Waiting for the server to close game.db...")
+            released = wait_for_release(database_file, self.config.release_timeout)
+            if released is False:
+                print(f"game.db is still in use after {self.config.release_timeout:.0f}s, "
+                      "blueprints stay queued for --apply-pending.")
+                return
+            # Without proof the server closed it, game.db must not be renamed under it
+            self.swap_allowed = bool(released)
+            if not released:
+                print("Can't tell whether the server has closed game.db (installing psutil may help), "
+                      "so it is compacted in place instead of swapped.")
+        try:
+            if not self.apply_pending(pending):
+                print("Cleanup failed, blueprints stay queued.")
+        except Exception as e:
+            print(f"Cleanup failed, blueprints stay queued: {str(e)}")
+
+    def apply_pending(self, pending: Optional[dict] = None) -> bool:
+        """Clean up every queued blueprint at once and empty the queue."""
+        if pending is None:
+            pending = self.load_pending()
+        if not pending['blueprints']:
+            print("No pending blueprints.")
+            return True
+        if not os.path.exists(self.config.database_file):
+            print(f"Database file '{self.config.database_file}' not found.")
+            return False
+
+        self.blueprint_paths = set(pending['blueprints'])
+        if self.config.orphan_cache:
+            self.skip_known_orphans()
+        if self.blueprint_paths:
+            self.write_sql_file()
+            self.database_updated = self.execute_sql_on_database()
         else:
-            # Use direct matching for other patterns
-            patterns_to_use = {}
-            if self.config.selected_pattern == "all":
-                patterns_to_use = self.config.error_patterns
-            elif self.config.selected_pattern == "standard_async":
-                patterns_to_use = {
-                    'async_loading': self.config.error_patterns['async_loading'],
-                    'standard_error': self.config.error_patterns['standard_error']
-                }
-            else:
-                patterns_to_use = {
-                    self.config.selected_pattern: self.config.error_patterns[self.config.selected_pattern]
-                }
-
-            # Process selected patterns
-            for pattern_name, pattern in patterns_to_use.items():
-                if pattern_name == 'standard_error':
-                    # Use chunking method for standard_error even in combined modes
-                    chunks = content.split('String asset reference "None"')
-                    for chunk in chunks[:-1]:
-                        lines = chunk.split('\n')
-                        for line in lines[-5:]:
-                            match = re.search(pattern, line)
-                            if match:
-                                self.blueprint_paths.add(match.group(1).strip())
-                                self.error_sources[pattern_name] += 1
-                                break
-                else:
-                    # Use direct matching for other patterns
-                    matches = re.finditer(pattern, content, re.MULTILINE | re.DOTALL)
-                    for match in matches:
-                        blueprint_path = match.group(1).strip()
-                        if pattern_name == 'nametoload':
-                            blueprint_path = blueprint_path.replace('\r', '')
-                        if blueprint_path:
-                            self.blueprint_paths.add(blueprint_path)
-                            self.error_sources[pattern_name] += 1
+            print("Nothing to clean up, game.db has no objects of the pending blueprints left."
+                  if self.orphans_checked else "Nothing to clean up.")
+            self.database_updated = True
+        if self.database_updated:
+            pending['blueprints'] = {}
+            self.save_pending(pending)
+        return self.database_updated
 
     def generate_sql(self, blueprint_path: str) -> list[str]:
        """Generate SQL statements for a single blueprint."""
@@ -329,6 +1269,247 @@ class BlueprintFixer:
            "--"  # Separator between matches
        ]
 
+    def cleanup_tables(self) -> List[str]:
+        """Tables the selected plan deletes from, in delete order."""
+        if self.config.cleanup_plan == "graph":
+            return [table for table, _ in self.orphan_tables]
+        return CLEANUP_TABLES
+
+    def cleanup_statements(self, orphan_ids: str) -> List[str]:
+        """DELETEs of the selected plan for the actor ids selected by `orphan_ids`."""
+        if self.config.cleanup_plan == "graph":
+            return [f"DELETE FROM {table} WHERE {column} IN ({orphan_ids});" for table, column in self.orphan_tables]
+        return cleanup_deletes(orphan_ids)
+
+    def load_orphan_tables(self) -> None:
+        """Find the object-keyed tables of game.db for the graph plan."""
+        connection = connect_readonly(self.config.database_file)
+        try:
+            self.orphan_tables = find_orphan_tables(connection)
+        finally:
+            connection.close()
+        print(f"Orphan graph: {', '.join(f'{table}.{column}' for table, column in self.orphan_tables)}")
+
+    def generate_cleanup_plan(self, blueprint_paths: Iterable[str]) -> List[str]:
+        """Generate a set-based cleanup for all blueprints at once.
+
+        Every affected actor_position id is resolved in a single scan into an
+        indexed temp table, then each table gets one DELETE against it.
+        """
+        select = prefix_match_select("temp.orphan_prefixes", self.database_class_indexed())
+        return [
+            "-- Resolve every orphaned actor once",
+            "CREATE TEMP TABLE IF NOT EXISTS orphan_prefixes (path TEXT PRIMARY KEY);",
+            "DELETE FROM temp.orphan_prefixes;",
+            *prefix_inserts("temp.orphan_prefixes", consolidate_prefixes(blueprint_paths)),
+            "CREATE TEMP TABLE IF NOT EXISTS orphan_ids (id INTEGER PRIMARY KEY);",
+            "DELETE FROM temp.orphan_ids;",
+            f"INSERT OR IGNORE INTO temp.orphan_ids SELECT id FROM ({select});",
+            *self.cleanup_statements("SELECT id FROM temp.orphan_ids"),
+            "DROP TABLE temp.orphan_ids;",
+            "DROP TABLE temp.orphan_prefixes;",
+            "--"
+        ]
+
+    def database_class_indexed(self) -> bool:
+        """has_class_index of game.db; False when it can't be read, then the plan scans."""
+        try:
+            connection = connect_readonly(self.config.database_file)
+        except sqlite3.Error:
+            return False
+        try:
+            return has_class_index(connection)
+        except sqlite3.Error:
+            return False
+        finally:
+            connection.close()
+
+    def count_actor_rows(self, connection: sqlite3.Connection, blueprint_paths: Iterable[str]) -> Dict[str, Optional[int]]:
+        """actor_position rows per blueprint path, matched like the cleanup plan matches them.
+
+        Uses one range count per path when class is indexed, otherwise a single
+        scan of actor_position that looks each class up in the consolidated
+        paths. A path inside another found path then only has a count (0) when
+        the outer path has no rows; otherwise its count is unknown (None).
+        """
+        blueprint_paths = sorted(blueprint_paths)
+        if self.config.cleanup_plan != "per_blueprint" and has_class_index(connection):
+            return {
+                path: connection.execute(
+                    "SELECT COUNT(*) FROM actor_position WHERE class >= ? AND class < ? || char(1114111);",
+                    (path, path)).fetchone()[0]
+                for path in blueprint_paths
+            }
+
+        probe_paths = blueprint_paths
+        if self.config.cleanup_plan == "per_blueprint":
+            # LIKE has no prefix lookup; CROSS JOIN keeps actor_position as the outer loop, so it is read only once
+            query = ("SELECT p.path, COUNT(*) FROM actor_position a CROSS JOIN temp.probe_paths p "
+                     "WHERE a.class LIKE p.path || '%' GROUP BY p.path;")
+        else:
+            probe_paths = consolidate_prefixes(blueprint_paths)
+            query = f"SELECT path, COUNT(*) FROM ({prefix_match_select('temp.probe_paths', False)}) GROUP BY path;"
+        connection.execute("CREATE TEMP TABLE probe_paths (path TEXT PRIMARY KEY);")
+        try:
+            connection.executemany("INSERT INTO temp.probe_paths VALUES (?);", [(path,) for path in probe_paths])
+            probed = {path: 0 for path in probe_paths}
+            for path, count in connection.execute(query):
+                probed[path] = count
+        finally:
+            connection.execute("DROP TABLE temp.probe_paths;")
+
+        rows: Dict[str, Optional[int]] = {}
+        outer = None
+        for path in blueprint_paths:
+            # Sorted, so the paths inside a probed path follow it directly
+            if path in probed:
+                outer = path
+                rows[path] = probed[path]
+            else:
+                rows[path] = 0 if probed[outer] == 0 else None
+        return rows
+
+    def skip_known_orphans(self, record: bool = True) -> int:
+        """Drop blueprints without objects left in game.db from the cleanup.
+
+        Found paths are probed read-only first, so a steady-state run whose
+        blueprints were all handled before needs no write lock, backup or
+        compaction. Without an index on class, probing means a full scan, so
+        when every path was verified against the unchanged game.db (same
+        size, modification time and inode) it is not read at all. With
+        record off, game.db-orphans is only read, never created or written.
+        Returns the number of skipped blueprints.
+        """
+        cache_file = self.config.database_file + "-orphans"
+        connection = None
+        cache = None
+        self.orphans_checked = True
+        try:
+            fingerprint = database_fingerprint(self.config.database_file)
+            known: Dict[str, Optional[str]] = {}
+            verified: Dict[str, str] = {}
+            if record:
+                cache = sqlite3.connect(cache_file)
+                cache.executescript(ORPHAN_CACHE_SCHEMA)
+            elif os.path.exists(cache_file):
+                cache = connect_readonly(cache_file)
+            if cache is not None:
+                tables = {name for (name,) in cache.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+                if "known_orphans" in tables:
+                    known = dict(cache.execute("SELECT path, cleaned_at FROM known_orphans;"))
+                if "verified_orphans" in tables:
+                    verified = dict(cache.execute("SELECT path, fingerprint FROM verified_orphans;"))
+            cleaned = {path: cleaned_at for path, cleaned_at in known.items() if cleaned_at}
+            connection = connect_readonly(self.config.database_file)
+            if self.blueprint_paths and all(verified.get(path) == fingerprint for path in self.blueprint_paths) and not (
+                    self.config.cleanup_plan != "per_blueprint" and has_class_index(connection)):
+                self.orphans_checked = False
+                self.actor_rows = {path: 0 for path in self.blueprint_paths}
+            else:
+                self.actor_rows = self.count_actor_rows(connection, self.blueprint_paths)
+
+            gone = sorted(path for path, count in self.actor_rows.items() if count == 0)
+            for path in sorted(self.blueprint_paths):
+                if path in cleaned and self.actor_rows[path]:
+                    print(f"Blueprint cleaned up on {cleaned[path]} has {self.actor_rows[path]} objects again: {path}")
+            if record and self.orphans_checked:
+                now = datetime.datetime.now().isoformat(timespec='seconds')
+                with cache:
+                    cache.executemany(
+                        "INSERT INTO known_orphans (path, rows_removed, last_checked) VALUES (?, 0, ?) "
+                        "ON CONFLICT (path) DO UPDATE SET last_checked = excluded.last_checked;",
+                        [(path, now) for path in gone]
+                    )
+                    cache.executemany("INSERT OR REPLACE INTO verified_orphans VALUES (?, ?);",
+                                      [(path, fingerprint) for path in gone])
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not check for already cleaned blueprints: {str(e)}")
+            self.orphans_checked = True
+            return 0
+        finally:
+            if cache is not None:
+                cache.close()
+            if connection is not None:
+                connection.close()
+
+        if not self.orphans_checked:
+            print(f"Skipping all {len(gone)} blueprints, an earlier run found no objects of them and game.db "
+                  "is unchanged since (not read again; use --no-orphan-cache to clean up anyway)")
+        elif gone:
+            cleaned_before = sum(1 for path in gone if path in cleaned)
+            print(f"Skipping {len(gone)} blueprints without objects left in game.db "
+                  f"({cleaned_before} of them cleaned up by an earlier run)")
+        self.blueprint_paths.difference_update(gone)
+        return len(gone)
+
+    def record_cleaned_orphans(self) -> None:
+        """Remember when the cleaned blueprints were removed, how many objects they had and the game.db they left."""
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        try:
+            fingerprint = database_fingerprint(self.config.database_file)
+            cache = sqlite3.connect(self.config.database_file + "-orphans")
+            try:
+                cache.executescript(ORPHAN_CACHE_SCHEMA)
+                with cache:
+                    cache.executemany(
+                        "INSERT OR REPLACE INTO known_orphans VALUES (?, ?, ?, ?);",
+                        [(path, now, self.actor_rows.get(path), now) for path in sorted(self.blueprint_paths)]
+                    )
+                    cache.executemany("INSERT OR REPLACE INTO verified_orphans VALUES (?, ?);",
+                                      [(path, fingerprint) for path in sorted(self.blueprint_paths)])
+            finally:
+                cache.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Could not record cleaned blueprints: {str(e)}")
+
+    def missing_mod_roots(self) -> List[str]:
+        """Mod folders of the found blueprints that are confirmed missing.
+
+        A folder is missing when no .pak in modlist.txt has its name (compared
+        case-insensitively). An empty or unreadable mod list confirms nothing;
+        the folders are then only listed as candidates for --group-mods.
+        """
+        named = {mod_folder_root(folder) for folder in self.config.group_mods or []}
+        roots = sorted({mod_root(path) for path in self.blueprint_paths} - {None} - named)
+        try:
+            installed = set(read_modlist(self.config.modlist_file))
+        except OSError as e:
+            print(f"Could not read mod list '{self.config.modlist_file}', not grouping any mod folders: {str(e)}")
+            installed = set()
+        else:
+            if not installed:
+                print(f"Mod list '{self.config.modlist_file}' lists no mods, not grouping any mod folders.")
+        if not installed:
+            if roots:
+                options = " ".join(f"--group-mods {root.rstrip('/').rsplit('/', 1)[-1]}" for root in roots)
+                print(f"Mod folders of the found blueprints, name the removed ones to clean them up: {options}")
+            return []
+        missing = []
+        for root in roots:
+            folder = root.rstrip('/').rsplit('/', 1)[-1]
+            if folder.lower() in installed:
+                print(f"Mod folder {root} has a .pak of the same name in the mod list, not cleaning it up as a whole")
+                continue
+            missing.append(root)
+        return missing
+
+    def consolidate_cleanup_paths(self) -> List[str]:
+        """Class prefixes for the cleanup: whole missing mods, then prefix-covered paths dropped."""
+        paths = set(self.blueprint_paths)
+        grouped = {mod_folder_root(folder) for folder in self.config.group_mods or []}
+        if self.config.modlist_file:
+            grouped.update(self.missing_mod_roots())
+        self.grouped_mods = sorted(grouped)
+        for root in self.grouped_mods:
+            covered = {path for path in paths if path.startswith(root)}
+            print(f"Cleaning up all objects in mod folder {root} ({len(covered)} blueprints found in the log)")
+            paths = (paths - covered) | {root}
+        prefixes = consolidate_prefixes(paths) if self.config.consolidate_paths else sorted(paths)
+        if len(prefixes) < len(self.blueprint_paths):
+            print(f"Consolidated {len(self.blueprint_paths)} blueprint paths into {len(prefixes)} class prefixes "
+                  f"({len(self.blueprint_paths) / len(prefixes):.1f}:1)")
+        return prefixes
+
     def write_sql_file(self) -> None:
         if not self.blueprint_paths:
             print("No missing blueprints found. SQL file will not be generated.")
@@ -338,39 +1519,383 @@ class BlueprintFixer:
             print(f"File '{self.config.output_file}' already exists and will be deleted.")
             os.remove(self.config.output_file)
 
-        self.sql_statements = []
+        for blueprint_path in sorted(self.blueprint_paths):
+            print(f"Found missing blueprint: {blueprint_path}")
+        self.plan_paths = self.consolidate_cleanup_paths()
+
+        if self.config.cleanup_plan == "graph":
+            self.load_orphan_tables()
+
+        statements = []
+        if self.config.cleanup_plan == "per_blueprint":
+            for blueprint_path in self.plan_paths:
+                statements.extend(self.generate_sql(blueprint_path))
+        else:
+            statements = self.generate_cleanup_plan(self.plan_paths)
+
+        self.sql_statements = [sql for sql in statements if not sql.startswith("--")]
+        self.maintenance_statements = self.script_maintenance_statements()
         with open(self.config.output_file, 'w') as writer:
-            for blueprint_path in sorted(self.blueprint_paths):
-                print(f"Found missing blueprint: {blueprint_path}")
-                statements = self.generate_sql(blueprint_path)
-                for sql in statements:
-                    writer.write(f"{sql}\n")
-                    if sql.startswith("DELETE"):
-                        self.sql_statements.append(sql)
+            for sql in statements:
+                writer.write(f"{sql}\n")
 
             # Add optimization commands
-            optimization_commands = [
-                "PRAGMA optimize;",
-                "VACUUM;",
-                "PRAGMA integrity_check;"
-            ]
-            for cmd in optimization_commands:
+            for cmd in self.maintenance_statements:
                 writer.write(f"{cmd}\n")
-                self.sql_statements.append(cmd)
+
+    def script_maintenance_statements(self) -> List[str]:
+        """Post-cleanup commands for the exported script."""
+        compaction = self.config.compaction
+        if compaction in ("auto", "vacuum_into"):
+            # A plain script can neither measure free pages nor swap files afterwards
+            compaction = "vacuum"
+        return ["PRAGMA optimize;"] + COMPACTION_SQL[compaction] + INTEGRITY_SQL[self.config.integrity_check]
+
+    def backup_database(self) -> Optional[str]:
+        """Snapshot game.db into backup_dir with the online backup API, keeping backup_keep snapshots."""
+        database_file = self.config.database_file
+        name = os.path.splitext(os.path.basename(database_file))[0]
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        os.makedirs(self.config.backup_dir, exist_ok=True)
+        backup_file = os.path.join(self.config.backup_dir, f"{name}-{stamp}.db")
+        try:
+            seconds = copy_database(database_file, backup_file, "Backing up")
+            size = os.path.getsize(backup_file)
+            if self.config.backup_compress:
+                start = time.perf_counter()
+                with open(backup_file, 'rb') as source, gzip.open(backup_file + '.gz', 'wb', compresslevel=1) as target:
+                    shutil.copyfileobj(source, target, 4 * 1024 * 1024)
+                os.remove(backup_file)
+                backup_file += '.gz'
+                seconds += time.perf_counter() - start
+        except (sqlite3.Error, OSError) as e:
+            print(f"Backup failed: {str(e)}")
+            return None
+
+        print(f"Backup written to: '{backup_file}' ({size / 1e6:,.0f} MB in {seconds:.1f}s, "
+              f"{size / 1e6 / max(seconds, 1e-9):,.0f} MB/s)")
+        self.prune_backups(name)
+        return backup_file
+
+    def prune_backups(self, name: str) -> None:
+        """Remove the oldest snapshots beyond backup_keep."""
+        backups = sorted(
+            glob.glob(os.path.join(self.config.backup_dir, f"{name}-*.db"))
+            + glob.glob(os.path.join(self.config.backup_dir, f"{name}-*.db.gz")),
+            key=os.path.getmtime
+        )
+        for old_backup in backups[:-self.config.backup_keep] if self.config.backup_keep > 0 else []:
+            os.remove(old_backup)
+            print(f"Removed old backup: '{old_backup}'")
+
+    def restore_database(self, backup_file: str) -> bool:
+        """Restore game.db from a snapshot (plain or .gz) through the online backup API."""
+        print(f"\nWARNING: This will overwrite the database file: {self.config.database_file}")
+        if self.config.interactive:
+            response = input(f"Restore it from '{backup_file}'? (yes/no): ").lower()
+            if response != "yes":
+                print("Restore cancelled.")
+                return False
+
+        source_file = backup_file
+        try:
+            if backup_file.endswith('.gz'):
+                source_file = self.config.database_file + ".restore"
+                with gzip.open(backup_file, 'rb') as source, open(source_file, 'wb') as target:
+                    shutil.copyfileobj(source, target, 4 * 1024 * 1024)
+            seconds = copy_database(source_file, self.config.database_file, "Restoring")
+        except (sqlite3.Error, OSError) as e:
+            print(f"Restore failed: {str(e)}")
+            return False
+        finally:
+            if source_file != backup_file and os.path.exists(source_file):
+                os.remove(source_file)
+
+        # What was cleaned up or resumable refers to the database just replaced
+        for stale_file in (self.config.database_file + "-orphans", self.config.database_file + "-cleanup"):
+            if os.path.exists(stale_file):
+                try:
+                    os.remove(stale_file)
+                    print(f"Removed '{stale_file}', it described the replaced database")
+                except OSError as e:
+                    print(f"Could not remove '{stale_file}': {str(e)}")
+        size = os.path.getsize(self.config.database_file)
+        print(f"Database restored ({size / 1e6:,.0f} MB in {seconds:.1f}s, {size / 1e6 / max(seconds, 1e-9):,.0f} MB/s)")
+        return True
 
     def execute_sql_on_database(self) -> bool:
-        """Execute the generated SQL statements on the database using sqlite3.exe."""
+        """Execute the generated SQL statements on the database."""
         print(f"\nWARNING: This will modify the database file: {self.config.database_file}")
-        print("It is recommended to backup your database before proceeding.")
-        response = input("Do you want to execute the SQL commands? (yes/no): ").lower()
+        if self.config.backup_dir:
+            print(f"A backup will be written to '{self.config.backup_dir}' first.")
+        else:
+            print("It is recommended to backup your database before proceeding (see --backup-dir).")
+        if self.config.interactive:
+            response = input("Do you want to execute the SQL commands? (yes/no): ").lower()
         
-        if response != "yes":
-            print("Database update cancelled.")
+            if response != "yes":
+                print("Database update cancelled.")
+                return False
+
+        if self.config.backup_dir:
+            with self.metrics.stage("backup") as stage:
+                backup_file = self.backup_database()
+                stage["database_bytes"] = os.path.getsize(self.config.database_file)
+            if not backup_file:
+                print("Database was not modified.")
+                return False
+
+        print("\nExecuting SQL commands...")
+        if self.config.sql_engine == "sqlite3.exe":
+            updated = self.execute_with_sqlite_exe()
+        elif self.config.batch_size > 0:
+            updated = self.execute_batched()
+        else:
+            updated = self.execute_with_sqlite_module()
+        if updated and self.config.orphan_cache:
+            self.record_cleaned_orphans()
+        return updated
+
+    @staticmethod
+    def tune_connection(connection: sqlite3.Connection) -> str:
+        """Apply the cleanup pragmas and return the database's journal mode."""
+        # WAL is persistent and may be what the server expects, so only a rollback journal is changed
+        journal_mode = connection.execute("PRAGMA journal_mode;").fetchone()[0].lower()
+        if journal_mode == "delete":
+            connection.execute("PRAGMA journal_mode = TRUNCATE;")
+        for pragma in SQLITE_TUNING_PRAGMAS:
+            connection.execute(pragma)
+        return journal_mode
+
+    def choose_compaction(self, connection: sqlite3.Connection) -> str:
+        """Pick a compaction strategy from the share of free space left by the cleanup."""
+        page_size = connection.execute("PRAGMA page_size;").fetchone()[0]
+        page_count = connection.execute("PRAGMA page_count;").fetchone()[0]
+        free_pages = connection.execute("PRAGMA freelist_count;").fetchone()[0]
+        # Deleted rows mostly leave half-empty pages rather than free ones, which dbstat can see
+        try:
+            unused_bytes = connection.execute(
+                "SELECT COALESCE(SUM(unused), 0) FROM dbstat WHERE aggregate = TRUE;").fetchone()[0]
+        except sqlite3.Error:  # dbstat is not compiled into every SQLite build
+            unused_bytes = 0
+        free_ratio = (free_pages * page_size + unused_bytes) / (page_count * page_size) if page_count else 0.0
+        print(f"Free space after cleanup: {free_ratio:.1%} ({free_pages:,} free pages of {page_count:,})")
+        if free_ratio < self.config.min_free_ratio:
+            return "none"
+        # incremental_vacuum only gives back free pages, not the space inside half-empty ones
+        auto_vacuum = connection.execute("PRAGMA auto_vacuum;").fetchone()[0]
+        if auto_vacuum == 2 and free_pages >= page_count * self.config.min_free_ratio:  # 2 = INCREMENTAL
+            return "incremental"
+        return "vacuum_into"
+
+    def vacuum_into(self, connection: sqlite3.Connection, journal_mode: str) -> sqlite3.Connection:
+        """Write a compacted copy with VACUUM INTO and swap it in, keeping the old file.
+
+        Writes the database once instead of twice like VACUUM, and the old file
+        doubles as a backup. Closes `connection` and returns one to the new file.
+        """
+        database_file = self.config.database_file
+        compacted_file = database_file + ".compacted"
+        previous_file = database_file + ".pre-vacuum"
+        if os.path.exists(compacted_file):
+            os.remove(compacted_file)
+        try:
+            connection.execute("VACUUM INTO ?;", (compacted_file,))
+        except sqlite3.Error:
+            # e.g. out of disk space; game.db itself is untouched
+            if os.path.exists(compacted_file):
+                os.remove(compacted_file)
+            raise
+        connection.close()
+        os.replace(database_file, previous_file)
+        try:
+            os.replace(compacted_file, database_file)
+        except OSError:
+            # Never leave the server without a game.db
+            os.replace(previous_file, database_file)
+            raise
+        print(f"Compacted database swapped in, previous file kept as: '{previous_file}'")
+        connection = sqlite3.connect(database_file, isolation_level=None)
+        if journal_mode == "wal":
+            connection.execute("PRAGMA journal_mode = WAL;")
+        return connection
+
+    def finish_cleanup(self, connection: sqlite3.Connection, journal_mode: str, table_rows: Dict[str, int]) -> None:
+        """Report deleted rows, restore the journal mode, then compact and check the database.
+
+        The deletes are committed by now, so a failure here is reported in
+        maintenance_error instead of failing the cleanup.
+        """
+        print("Rows deleted:")
+        for table, rows in table_rows.items():
+            print(f"- {table}: {rows}")
+
+        swapped = False
+        try:
+            if journal_mode == "delete":
+                connection.execute("PRAGMA journal_mode = DELETE;")
+            connection.execute("PRAGMA optimize;")
+
+            with self.metrics.stage("compaction") as stage:
+                compaction = self.config.compaction
+                if compaction == "auto":
+                    compaction = self.choose_compaction(connection)
+                if compaction == "vacuum_into" and not self.swap_allowed:
+                    compaction = "vacuum"  # Rewrites game.db in place, so an open handle stays valid
+                print(f"Compaction: {compaction}")
+                if compaction == "vacuum_into":
+                    connection = self.vacuum_into(connection, journal_mode)
+                    swapped = True
+                for sql in COMPACTION_SQL.get(compaction, []):
+                    connection.execute(sql).fetchall()  # incremental_vacuum only runs while stepped
+                stage.update(compaction=compaction, database_bytes=os.path.getsize(self.config.database_file))
+
+            with self.metrics.stage("integrity_check") as stage:
+                output = []
+                for sql in INTEGRITY_SQL[self.config.integrity_check]:
+                    output.extend(" ".join(str(value) for value in row) for row in connection.execute(sql))
+                stage["check"] = self.config.integrity_check
+            if output:
+                print("SQLite output:")
+                print("\n".join(output))
+        except (sqlite3.Error, OSError) as e:
+            self.maintenance_error = str(e)
+            print(f"Cleanup committed, but compaction or integrity check failed: {str(e)}")
+        finally:
+            if swapped:
+                connection.close()
+        print("Database updated successfully!")
+
+    def execute_with_sqlite_module(self) -> bool:
+        """Run all cleanup statements in one transaction through Python's sqlite3 module."""
+        self.statement_results = []
+        connection = None
+        try:
+            connection = sqlite3.connect(self.config.database_file, isolation_level=None)
+            journal_mode = self.tune_connection(connection)
+
+            with self.metrics.stage("execute") as stage:
+                connection.execute("BEGIN IMMEDIATE;")
+                try:
+                    for sql in self.sql_statements:
+                        cursor = connection.execute(sql)
+                        self.statement_results.append((sql, cursor.rowcount))
+                    connection.execute("COMMIT;")
+                except BaseException:
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK;")
+                    raise
+
+                table_rows: Dict[str, int] = {}
+                for sql, rows in self.statement_results:
+                    if sql.startswith("DELETE FROM") and not sql.startswith("DELETE FROM temp."):
+                        table = sql.split()[2]
+                        table_rows[table] = table_rows.get(table, 0) + rows
+                stage["rows_deleted"] = table_rows
+            self.finish_cleanup(connection, journal_mode, table_rows)
+            return True
+
+        except sqlite3.Error as e:
+            print(f"Error executing SQL commands: {str(e)}")
             return False
+        finally:
+            if connection is not None:
+                connection.close()
 
+    def execute_batched(self) -> bool:
+        """Delete orphans in committed batches of object ids.
+
+        The resolved ids and the last committed batch are kept in a side file
+        next to game.db, so an interrupted run resumes where it stopped.
+        """
+        work_file = self.config.database_file + "-cleanup"
+        plan_key = hashlib.sha256("\n".join(self.plan_paths).encode('utf-8')).hexdigest()
+        batch_ids = "SELECT id FROM cleanup.orphan_ids WHERE id > :low AND id <= :high"
+        deletes = self.cleanup_statements(batch_ids)
+        batch_size = self.config.batch_size
+        self.statement_results = []
+        table_rows = {table: 0 for table in self.cleanup_tables()}
+        connection = None
+        try:
+            connection = sqlite3.connect(self.config.database_file, isolation_level=None)
+            journal_mode = self.tune_connection(connection)
+            connection.execute("ATTACH DATABASE ? AS cleanup;", (work_file,))
+            connection.execute("CREATE TABLE IF NOT EXISTS cleanup.orphan_ids (id INTEGER PRIMARY KEY);")
+            connection.execute("CREATE TABLE IF NOT EXISTS cleanup.progress (plan_key TEXT, last_id INTEGER);")
+
+            with self.metrics.stage("execute") as stage:
+                progress = connection.execute("SELECT plan_key, last_id FROM cleanup.progress;").fetchone()
+                if progress and progress[0] == plan_key:
+                    last_id = progress[1]
+                    print(f"Resuming batched cleanup after object id {last_id}")
+                else:
+                    connection.execute("CREATE TEMP TABLE orphan_prefixes (path TEXT PRIMARY KEY);")
+                    connection.executemany("INSERT OR IGNORE INTO temp.orphan_prefixes VALUES (?);",
+                                           [(path,) for path in consolidate_prefixes(self.plan_paths)])
+                    select = prefix_match_select("temp.orphan_prefixes", has_class_index(connection))
+                    connection.execute("BEGIN IMMEDIATE;")
+                    connection.execute("DELETE FROM cleanup.orphan_ids;")
+                    connection.execute("DELETE FROM cleanup.progress;")
+                    connection.execute(f"INSERT OR IGNORE INTO cleanup.orphan_ids SELECT id FROM ({select});")
+                    last_id = connection.execute("SELECT COALESCE(MIN(id), 0) - 1 FROM cleanup.orphan_ids;").fetchone()[0]
+                    connection.execute("INSERT INTO cleanup.progress VALUES (?, ?);", (plan_key, last_id))
+                    connection.execute("COMMIT;")
+
+                remaining = connection.execute("SELECT COUNT(*) FROM cleanup.orphan_ids WHERE id > ?;", (last_id,)).fetchone()[0]
+                print(f"{remaining:,} orphaned objects to delete in batches of {batch_size:,}")
+                done = 0
+                batch = 0
+                while True:
+                    high, count = connection.execute(
+                        "SELECT MAX(id), COUNT(*) FROM (SELECT id FROM cleanup.orphan_ids WHERE id > ? ORDER BY id LIMIT ?);",
+                        (last_id, batch_size)
+                    ).fetchone()
+                    if high is None:
+                        break
+
+                    start = time.perf_counter()
+                    connection.execute("BEGIN IMMEDIATE;")
+                    try:
+                        for sql in deletes:
+                            rows = connection.execute(sql, {"low": last_id, "high": high}).rowcount
+                            table_rows[sql.split()[2]] += rows
+                            self.statement_results.append((sql, rows))
+                        connection.execute("UPDATE cleanup.progress SET last_id = ?;", (high,))
+                        connection.execute("COMMIT;")
+                    except BaseException:
+                        if connection.in_transaction:
+                            connection.execute("ROLLBACK;")
+                        raise
+                    elapsed = time.perf_counter() - start
+
+                    batch += 1
+                    done += count
+                    last_id = high
+                    print(f"Batch {batch}: {done:,}/{remaining:,} objects ({elapsed:.2f}s)")
+                    if journal_mode == "wal" and batch % self.config.wal_checkpoint_batches == 0:
+                        connection.execute("PRAGMA main.wal_checkpoint(TRUNCATE);")
+                    if elapsed > self.config.batch_max_seconds and batch_size > 100:
+                        batch_size //= 2
+
+                if journal_mode == "wal":
+                    connection.execute("PRAGMA main.wal_checkpoint(TRUNCATE);")
+                stage.update(rows_deleted=table_rows, batches=batch)
+            connection.execute("DETACH DATABASE cleanup;")
+            os.remove(work_file)
+            self.finish_cleanup(connection, journal_mode, table_rows)
+            return True
+
+        except sqlite3.Error as e:
+            print(f"Error executing SQL commands: {str(e)}")
+            print("Run again with the same log to resume from the last committed batch.")
+            return False
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def execute_with_sqlite_exe(self) -> bool:
+        """Pipe the generated SQL script to sqlite3.exe."""
         try:
-            print("\nExecuting SQL commands...")
-            
             # Construct the sqlite3 command with input redirection
             command = [
                 self.config.sqlite_exe,
@@ -381,17 +1906,19 @@ class BlueprintFixer:
             with open(self.config.output_file, 'r') as sql_file:
                 sql_content = sql_file.read()
             
-            # Execute the command with input piping
-            process = subprocess.Popen(
-                command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            with self.metrics.stage("execute") as stage:
+                stage["engine"] = "sqlite3.exe"  # Includes the compaction and checks in the script
+                # Execute the command with input piping
+                process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
             
-            # Send the SQL commands to sqlite3
-            stdout, stderr = process.communicate(input=sql_content)
+                # Send the SQL commands to sqlite3
+                stdout, stderr = process.communicate(input=sql_content)
             
             # Check for errors
             if process.returncode != 0:
@@ -415,6 +1942,140 @@ class BlueprintFixer:
             print(f"An error occurred: {str(e)}")
             return False
 
+    def count_rows_per_blueprint(self, connection: sqlite3.Connection) -> Dict[str, Dict[str, int]]:
+        """Rows each cleanup table would lose, per blueprint, in one scan of actor_position.
+
+        A row matched by several overlapping paths is counted for the first path
+        in sorted order, which is the one whose DELETEs would remove it.
+        """
+        connection.execute("CREATE TEMP TABLE dry_run_paths (path TEXT PRIMARY KEY);")
+        connection.execute("CREATE TEMP TABLE dry_run_ids (id INTEGER PRIMARY KEY, path TEXT);")
+        if self.config.cleanup_plan == "per_blueprint":
+            connection.executemany("INSERT INTO temp.dry_run_paths VALUES (?);",
+                                   [(path,) for path in self.plan_paths])
+            # LIKE has no prefix lookup; CROSS JOIN keeps actor_position as the outer loop, so it is read only once
+            connection.execute(
+                "INSERT INTO temp.dry_run_ids SELECT a.id, MIN(p.path) FROM actor_position a "
+                "CROSS JOIN temp.dry_run_paths p WHERE a.class LIKE p.path || '%' GROUP BY a.id;"
+            )
+        else:
+            # The shortest of several overlapping paths sorts first and is the only one kept
+            connection.executemany("INSERT INTO temp.dry_run_paths VALUES (?);",
+                                   [(path,) for path in consolidate_prefixes(self.plan_paths)])
+            select = prefix_match_select("temp.dry_run_paths", has_class_index(connection))
+            connection.execute(f"INSERT OR IGNORE INTO temp.dry_run_ids {select};")
+        if self.config.cleanup_plan == "graph":
+            queries = {
+                table: f"SELECT d.path, COUNT(*) FROM temp.dry_run_ids d JOIN {table} t ON t.{column} = d.id GROUP BY d.path;"
+                for table, column in self.orphan_tables
+            }
+        else:
+            queries = {
+                "actor_position": "SELECT d.path, COUNT(*) FROM temp.dry_run_ids d GROUP BY d.path;",
+                "properties": "SELECT d.path, COUNT(*) FROM temp.dry_run_ids d JOIN properties t ON t.object_id = d.id GROUP BY d.path;",
+                "buildings": "SELECT d.path, COUNT(*) FROM temp.dry_run_ids d JOIN buildings t ON t.object_id = d.id "
+                             "WHERE t.object_id IN (SELECT object_id FROM properties) GROUP BY d.path;",
+                "buildable_health": "SELECT d.path, COUNT(*) FROM temp.dry_run_ids d JOIN buildable_health t ON t.object_id = d.id "
+                                    "WHERE t.object_id IN (SELECT object_id FROM buildings WHERE object_id IN "
+                                    "(SELECT object_id FROM properties)) GROUP BY d.path;",
+            }
+        rows = {path: {table: 0 for table in self.cleanup_tables()} for path in self.plan_paths}
+        for table in self.cleanup_tables():
+            for path, count in connection.execute(queries[table]):
+                rows[path][table] = count
+        connection.execute("DROP TABLE temp.dry_run_ids;")
+        connection.execute("DROP TABLE temp.dry_run_paths;")
+        return rows
+
+    def dry_run(self) -> Optional[dict]:
+        """Measure what the generated cleanup would do without modifying game.db."""
+        connection = None
+        try:
+            connection = connect_readonly(self.config.database_file)
+            start = time.perf_counter()
+            rows = self.count_rows_per_blueprint(connection)
+            count_seconds = time.perf_counter() - start
+
+            statements = []
+            sampled: Dict[str, List[float]] = {}
+            totals: Dict[str, int] = {}
+            for sql in self.sql_statements:
+                words = sql.split()
+                entry = {"sql": sql}
+                if words[0] in ("INSERT", "DELETE") or words[:2] == ["SELECT", "COUNT"]:
+                    entry["query_plan"] = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + sql)]
+                    entry["full_scans"] = scanned_tables(sql, entry["query_plan"])
+
+                if words[0] == "DELETE" and not words[2].startswith("temp."):
+                    # Time the row search of the DELETE as a COUNT on a sample of statements
+                    table = words[2]
+                    totals[table] = totals.get(table, 0) + 1
+                    if len(sampled.setdefault(table, [])) < DRY_RUN_SAMPLE_STATEMENTS:
+                        start = time.perf_counter()
+                        entry["rows"] = connection.execute("SELECT COUNT(*) FROM " + sql[len("DELETE FROM "):]).fetchone()[0]
+                        entry["search_seconds"] = round(time.perf_counter() - start, 6)
+                        sampled[table].append(entry["search_seconds"])
+                elif words[0] in ("CREATE", "INSERT", "DELETE", "DROP"):
+                    # Only touches the temp schema, so it can really run here
+                    start = time.perf_counter()
+                    entry["rows"] = connection.execute(sql).rowcount
+                    entry["search_seconds"] = round(time.perf_counter() - start, 6)
+                    sampled.setdefault("temp", []).append(entry["search_seconds"])
+                    totals["temp"] = totals.get("temp", 0) + 1
+                statements.append(entry)
+
+            search_seconds = sum(sum(times) / len(times) * totals[table] for table, times in sampled.items() if times)
+            rows_deleted = sum(sum(table_rows.values()) for table_rows in rows.values())
+            page_size = connection.execute("PRAGMA page_size;").fetchone()[0]
+            return {
+                "generated_at": datetime.datetime.now().isoformat(timespec='seconds'),
+                "database_file": os.path.abspath(self.config.database_file),
+                "database_bytes": page_size * connection.execute("PRAGMA page_count;").fetchone()[0],
+                "free_bytes": page_size * connection.execute("PRAGMA freelist_count;").fetchone()[0],
+                "cleanup_plan": self.config.cleanup_plan,
+                "consolidation": {
+                    "blueprints": len(self.blueprint_paths),
+                    "class_prefixes": len(self.plan_paths),
+                    "ratio": round(len(self.blueprint_paths) / max(len(self.plan_paths), 1), 2),
+                    "grouped_mods": self.grouped_mods,
+                },
+                "blueprints": [
+                    {"path": path, "rows": rows[path], "total_rows": sum(rows[path].values())}
+                    for path in sorted(rows)
+                ],
+                "rows_per_table": {table: sum(table_rows[table] for table_rows in rows.values()) for table in self.cleanup_tables()},
+                "count_seconds": round(count_seconds, 3),
+                "statements": statements,
+                "maintenance_statements": self.maintenance_statements,
+                "estimate": {
+                    "search_seconds": round(search_seconds, 3),
+                    "rows_deleted": rows_deleted,
+                    "row_delete_seconds": ROW_DELETE_SECONDS,
+                    "estimated_seconds": round(search_seconds + rows_deleted * ROW_DELETE_SECONDS, 3),
+                    "note": "Excludes VACUUM and integrity_check; search time is sampled per table and extrapolated",
+                },
+            }
+        except sqlite3.Error as e:
+            print(f"Dry run failed: {str(e)}")
+            return None
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def write_dry_run_report(self) -> bool:
+        """Run the dry run and write its report as JSON."""
+        print(f"\nDry run against {self.config.database_file} (read-only)...")
+        report = self.dry_run()
+        if report is None:
+            return False
+        with open(self.config.dry_run_report, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        for table, count in report["rows_per_table"].items():
+            print(f"- {table}: {count} rows would be deleted")
+        print(f"Estimated cleanup time: {report['estimate']['estimated_seconds']}s")
+        print(f"Dry run report written to: '{self.config.dry_run_report}'")
+        return True
+
     def process(self) -> Optional[int]:
         """Main processing method."""
         try:
@@ -424,9 +2085,6 @@ class BlueprintFixer:
             if not self.choose_pattern():
                 return None
 
-            with open(self.config.input_file, 'r', encoding='utf-8', errors='ignore') as file:
-                content = file.read()
-
             pattern_desc = {
                 "all": "all patterns",
                 "standard_async": "Standard + Async patterns",
@@ -436,13 +2094,27 @@ class BlueprintFixer:
             }
 
             print(f"\nSearching for missing blueprint errors using {pattern_desc[self.config.selected_pattern]}...")
-            self.extract_blueprints(content)
+            with self.metrics.stage("scan") as stage:
+                self.extract_blueprints_from_sources(self.config.input_file)
+                stage.update(bytes_read=self.bytes_scanned, lines_scanned=self.lines_scanned,
+                             matches=dict(self.error_sources), blueprints=len(self.blueprint_paths))
             
             if not self.blueprint_paths:
                 print("No missing blueprints found.")
                 return 0
+
+            if self.config.orphan_cache:
+                with self.metrics.stage("probe") as stage:
+                    # A dry run only reads game.db-orphans
+                    stage["skipped"] = self.skip_known_orphans(record=not self.config.dry_run_report)
+                if not self.blueprint_paths:
+                    print("Nothing to clean up, game.db has no objects of the missing blueprints left."
+                          if self.orphans_checked else "Nothing to clean up.")
+                    return 0
                 
-            self.write_sql_file()
+            with self.metrics.stage("generate") as stage:
+                self.write_sql_file()
+                stage.update(statements=len(self.sql_statements), class_prefixes=len(self.plan_paths))
             print(f"\nGenerated SQL script in file: '{self.config.output_file}'")
             print(f"Found {len(self.blueprint_paths)} unique missing blueprints")
             
@@ -452,21 +2124,260 @@ class BlueprintFixer:
                 for source, count in self.error_sources.items():
                     if count > 0:
                         print(f"- {source}: {count} matches")
+
+            if self.file_sources:
+                print("\nMatches per log file:")
+                for log_file, count in self.file_sources.items():
+                    print(f"- {os.path.basename(log_file)}: {count} matches")
             
+            if self.config.dry_run_report:
+                with self.metrics.stage("dry_run"):
+                    self.write_dry_run_report()
+                return len(self.blueprint_paths)
+
             # Ask about database execution
-            self.execute_sql_on_database()
+            self.database_updated = self.execute_sql_on_database()
             
             return len(self.blueprint_paths)
 
         except Exception as ex:
             print("An error occurred:", str(ex))
             return None
+        finally:
+            if self.config.metrics_file and self.metrics.stages:
+                self.metrics.write(self.config.metrics_file)
+
+    def run_status(self, result: Optional[int]) -> str:
+        """Outcome of process() for scripts: failed, clean, reported or cleaned."""
+        if result is None:
+            return "failed"
+        if result == 0:
+            return "clean"
+        if self.config.dry_run_report:
+            return "reported"
+        return "cleaned" if self.database_updated else "failed"
+
+def instance_path(path: Optional[str], name: str) -> Optional[str]:
+    """Per-instance variant of an output path, e.g. metrics.json -> metrics-server1.json."""
+    if not path:
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{name}{extension}"
+
+def load_batch_file(batch_file: str, base_config: Config) -> List[Tuple[str, Config]]:
+    """Read the (log, db) pairs of a batch file into one headless Config per instance.
+
+    The file is JSON: {"pattern": "all", "instances": [{"name": "pve1", "log": "...", "db": "..."}]}.
+    Instances may override "pattern"; every other option comes from the command line.
+    """
+    with open(batch_file, 'r', encoding='utf-8') as file:
+        batch = json.load(file)
+    instances = []
+    for index, entry in enumerate(batch["instances"], 1):
+        name = entry.get("name") or f"server{index}"
+        config = replace(
+            base_config,
+            input_file=entry["log"],
+            database_file=entry["db"],
+            output_file=entry.get("output") or f"CleanUpScript-{name}.sql",
+            selected_pattern=entry.get("pattern") or batch.get("pattern") or base_config.selected_pattern,
+            dry_run_report=instance_path(base_config.dry_run_report, name),
+            metrics_file=instance_path(base_config.metrics_file, name),
+            checkpoint_file=instance_path(base_config.checkpoint_file, name),
+            # Backups are pruned by database name, which is game.db for every instance
+            backup_dir=os.path.join(base_config.backup_dir, name) if base_config.backup_dir else None,
+            profile_stages=None,  # profile-<stage>.prof files would overwrite each other
+            interactive=False,
+        )
+        instances.append((name, config))
+
+    names = [name for name, _ in instances]
+    databases = [os.path.abspath(config.database_file) for _, config in instances]
+    if len(set(names)) != len(names) or len(set(databases)) != len(databases):
+        raise ValueError("every instance needs its own name and game.db")
+    return instances
+
+def run_instance(name: str, config: Config, console_log: str) -> Dict:
+    """Process one instance with its output written to console_log; runs in worker processes."""
+    start = time.perf_counter()
+    fixer = BlueprintFixer(config)
+    with open(console_log, 'w', encoding='utf-8') as output, redirect_stdout(output):
+        result = fixer.process()
+
+    rows_deleted = {}
+    for stage in fixer.metrics.stages:
+        if stage["stage"] == "execute":
+            rows_deleted = stage.get("rows_deleted", {})
+    return {
+        "name": name,
+        "log": config.input_file,
+        "db": config.database_file,
+        "status": fixer.run_status(result),
+        "blueprints": len(fixer.blueprint_paths),
+        "matches": fixer.error_sources,
+        "rows_deleted": rows_deleted,
+        "maintenance_error": fixer.maintenance_error,
+        "seconds": round(time.perf_counter() - start, 3),
+        "console_log": console_log,
+    }
+
+def run_batch(batch_file: str, base_config: Config, workers: int, summary_file: str) -> bool:
+    """Clean every instance of a batch file concurrently, one process per game.db, and write a summary."""
+    try:
+        instances = load_batch_file(batch_file, base_config)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Invalid batch file '{batch_file}': {str(e)}")
+        return False
+
+    workers = min(workers or os.cpu_count() or 1, len(instances)) or 1
+    print(f"Processing {len(instances)} instances with {workers} workers...")
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_instance, name, config, instance_path("console.log", name)): name
+            for name, config in instances
+        }
+        for future in futures:
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # A crashed worker must not hide the other instances' results
+                result = {"name": name, "status": "failed", "error": str(e)}
+            results.append(result)
+            rows = sum(result.get("rows_deleted", {}).values())
+            print(f"- {name}: {result['status']}, {result.get('blueprints', 0)} missing blueprints, "
+                  f"{rows:,} rows deleted ({result.get('seconds', 0):.1f}s)")
+            if result.get("maintenance_error"):
+                print(f"  compaction or integrity check failed: {result['maintenance_error']}")
+
+    seconds = time.perf_counter() - start
+    summary = {
+        "created": datetime.datetime.now().isoformat(timespec='seconds'),
+        "batch_file": os.path.abspath(batch_file),
+        "workers": workers,
+        "wall_seconds": round(seconds, 3),
+        "instance_seconds": round(sum(result.get("seconds", 0) for result in results), 3),
+        "instances": results,
+    }
+    with open(summary_file, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+    failed = [result["name"] for result in results if result["status"] == "failed"]
+    print(f"\nFinished {len(results)} instances in {seconds:.1f}s "
+          f"({summary['instance_seconds']:.1f}s if run one after another)")
+    if failed:
+        print(f"Failed: {', '.join(failed)} (see console-<name>.log)")
+    print(f"Summary written to: '{summary_file}'")
+    return not failed
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Conan Exiles Missing Blueprint Fix Generator")
+    parser.add_argument('--log', metavar='PATH',
+                        help="Log file, directory of rotated logs or glob (.log, .gz and .zst are read)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Scan large logs in parallel with this many processes (default: 1)")
+    parser.add_argument('--engine', choices=['python', 'sqlite3.exe'], default='python',
+                        help="Run the cleanup in-process (default) or through sqlite3.exe")
+    parser.add_argument('--plan', choices=['set', 'per_blueprint', 'graph'], default='set',
+                        help="Set-based cleanup over all blueprints (default), the original DELETEs per blueprint, "
+                             "or set-based over every object-keyed table")
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help="Delete in committed batches of this many objects to bound lock time and WAL size")
+    parser.add_argument('--compaction', choices=['auto', 'none', 'incremental', 'vacuum', 'vacuum_into'], default='auto',
+                        help="How to compact game.db after the cleanup (default: pick from the free space)")
+    parser.add_argument('--integrity-check', choices=['quick', 'full', 'none'], default='quick',
+                        help="Check run after the cleanup (default: quick_check)")
+    parser.add_argument('--db', metavar='PATH', help="Path to game.db")
+    parser.add_argument('--backup-dir', metavar='DIR',
+                        help="Snapshot game.db into DIR with the SQLite backup API before modifying it")
+    parser.add_argument('--backup-compress', action='store_true', help="gzip the snapshot")
+    parser.add_argument('--backup-keep', type=int, default=3, help="Snapshots to keep in the backup dir (default: 3)")
+    parser.add_argument('--restore', metavar='BACKUP', help="Restore game.db from a snapshot and exit")
+    parser.add_argument('--dry-run', metavar='REPORT',
+                        help="Only write a JSON report of the rows, query plans and estimated time of the cleanup")
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help="Remember how far the log was scanned and only scan new lines next run")
+    parser.add_argument('--pattern', choices=['standard_error', 'async_loading', 'nametoload', 'all', 'standard_async'],
+                        help="Error pattern to use (default: asked, or standard_error with --yes/--batch)")
+    parser.add_argument('--yes', action='store_true',
+                        help="Never prompt: use the given paths and --pattern and run the cleanup unconfirmed")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Clean several servers listed as (log, db) pairs in a JSON file concurrently, without prompts")
+    parser.add_argument('--batch-workers', type=int, default=0,
+                        help="Instances processed at once in --batch mode (default: one per CPU)")
+    parser.add_argument('--summary', metavar='FILE', default='batch-summary.json',
+                        help="Combined JSON summary of a --batch run (default: batch-summary.json)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep following the log and queue missing blueprints in the --pending file")
+    parser.add_argument('--watch-interval', type=float, default=2.0, help="Seconds between log polls (default: 2)")
+    parser.add_argument('--pending', metavar='FILE', default='pending-blueprints.json',
+                        help="Queue of blueprints found by --watch (default: pending-blueprints.json)")
+    parser.add_argument('--apply-on-stop', action='store_true',
+                        help="With --watch, clean up the queued blueprints as soon as the server logs its shutdown")
+    parser.add_argument('--release-timeout', type=float, default=300.0,
+                        help="Seconds --apply-on-stop waits for the server to release game.db (default 300)")
+    parser.add_argument('--apply-pending', action='store_true',
+                        help="Clean up the queued blueprints from --pending now and exit")
+    parser.add_argument('--no-orphan-cache', action='store_true',
+                        help="Don't probe game.db for blueprints without objects or record cleaned ones in game.db-orphans")
+    parser.add_argument('--no-consolidate', action='store_true',
+                        help="Keep one class prefix per blueprint even if a shorter found path already covers it")
+    parser.add_argument('--group-missing-mods', metavar='MODLIST',
+                        help="Clean up everything under /Game/Mods/<folder>/ of mods confirmed missing from this modlist.txt")
+    parser.add_argument('--group-mods', metavar='FOLDER', action='append',
+                        help="Clean up everything under /Game/Mods/FOLDER/ (repeatable)")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Write wall/CPU time, memory and counters of each stage to FILE (.json or .csv)")
+    parser.add_argument('--profile', metavar='STAGE', action='append',
+                        choices=['scan', 'probe', 'generate', 'backup', 'execute', 'compaction', 'integrity_check',
+                                 'dry_run', 'all'],
+                        help="Run a stage under cProfile and dump profile-STAGE.prof (repeatable)")
+    args = parser.parse_args()
+    for folder in args.group_mods or []:
+        if mod_folder_root(folder) is None:
+            parser.error(f"--group-mods needs a single mod folder name, not '{folder}'")
+    return args
 
 def main():
+    multiprocessing.freeze_support()  # Needed for the worker pool in the packaged .exe
+    args = parse_args()
     print_header()
-    config = Config()
+    config = Config(workers=args.workers, checkpoint_file=args.checkpoint, sql_engine=args.engine,
+                    cleanup_plan=args.plan, dry_run_report=args.dry_run, batch_size=args.batch_size,
+                    compaction=args.compaction, integrity_check=args.integrity_check,
+                    backup_dir=args.backup_dir, backup_compress=args.backup_compress, backup_keep=args.backup_keep,
+                    metrics_file=args.metrics, profile_stages=args.profile,
+                    interactive=not (args.yes or args.batch or args.watch), pending_file=args.pending,
+                    watch_interval=args.watch_interval, apply_on_stop=args.apply_on_stop,
+                    release_timeout=args.release_timeout,
+                    orphan_cache=not args.no_orphan_cache, consolidate_paths=not args.no_consolidate,
+                    modlist_file=args.group_missing_mods, group_mods=args.group_mods)
+    if args.pattern:
+        config.selected_pattern = args.pattern
+    if args.log:
+        config.input_file = args.log
+    if args.db:
+        config.database_file = args.db
+    if args.batch:
+        if not run_batch(args.batch, config, args.batch_workers, args.summary):
+            raise SystemExit(1)
+        return
     fixer = BlueprintFixer(config)
+    if args.restore:
+        fixer.restore_database(args.restore)
+        return
+    if args.watch:
+        fixer.watch_log()
+        return
+    if args.apply_pending:
+        if not fixer.apply_pending() and not config.interactive:
+            raise SystemExit(1)
+        return
     result = fixer.process()
+    if not config.interactive:
+        if fixer.run_status(result) == "failed":
+            raise SystemExit(1)
+        return
     
     if result is not None:
         print("\nPress Enter to Close.")
@@ -0,0 +1,344 @@
+import os
+import io
+import glob
+import json
+import time
+import shutil
+import random
+import sqlite3
+import argparse
+import platform
+import datetime
+import tempfile
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Iterator
+
+from DBFixResavingPackage import Config, BlueprintFixer, peak_rss_bytes
+
+GAME_DB_SCHEMA = """
+CREATE TABLE actor_position (class TEXT, map TEXT, id INTEGER, x REAL, y REAL, z REAL, sx REAL, sy REAL, sz REAL, rx REAL, ry REAL, rz REAL, rw REAL, PRIMARY KEY (id));
+CREATE TABLE properties (object_id INTEGER, name TEXT, value BLOB, PRIMARY KEY (object_id, name));
+CREATE TABLE buildings (object_id INTEGER PRIMARY KEY, owner_id INTEGER);
+CREATE TABLE buildable_health (object_id INTEGER, instance_id INTEGER, health_id INTEGER, health_percentage REAL, PRIMARY KEY (object_id, instance_id, health_id));
+"""
+
+# Further object-keyed tables of a real game.db, added for the orphan_graph stage
+OBJECT_GRAPH_SCHEMA = """
+CREATE TABLE item_inventory (item_id INTEGER, owner_id INTEGER, inv_type INTEGER, template_id INTEGER, data BLOB, PRIMARY KEY (item_id, owner_id, inv_type));
+CREATE TABLE item_properties (item_id INTEGER, owner_id INTEGER, inv_type INTEGER, name TEXT, value BLOB, PRIMARY KEY (item_id, owner_id, inv_type, name));
+CREATE TABLE follower_markers (owner_id INTEGER, follower_id INTEGER, x REAL, y REAL, z REAL, PRIMARY KEY (owner_id, follower_id));
+CREATE TABLE destruction_history (object_id INTEGER, class TEXT, owner_id INTEGER, destroyed_at INTEGER);
+CREATE INDEX destruction_history_object ON destruction_history (object_id);
+"""
+
+# Filler lines modelled on a real server log; {n} keeps them from being identical
+FILLER_LINES = [
+    "LogNet: Login request: ?Name=Player{n} userId: Steam:7656119{n:010d}",
+    "LogStreaming:Display: FlushAsyncLoading: 1 QueuedPackages, 0 AsyncPackages",
+    "LogSpawn: Warning: SpawnActor failed because of collision at the spawn location [X={n}.0 Y=-{n}.5 Z=2.0]",
+    "LogServerStats: Sent {n} bytes to 40 connections",
+    "LogPackageName:Warning: Please consider resaving package in order to speed-up loading.",
+]
+STRING_ASSET_WARNING = ("LogPackageName:Warning: String asset reference \"None\" is in short form, which is "
+                        "unsupported and -- even if valid -- resolving it will be really slow.")
+# Stages measured by default, in run order
+STAGES = ["extract", "generate", "execute", "orphan_graph"]
+
+def tool_version() -> str:
+    """Version from the '# vX.Y.Z' header of DBFixResavingPackage.py."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DBFixResavingPackage.py")
+    with open(script, encoding='utf-8') as file:
+        return file.readline().lstrip('#').strip()
+
+def missing_blueprint(index: int) -> str:
+    return f"/Game/Mods/MissingMod{index}/Placeables/BP_Placeable{index}"
+
+def log_lines(rng: random.Random, blueprints: int, hit_density: float) -> Iterator[str]:
+    """Endless ConanSandbox.log lines mixing the three error shapes with filler lines."""
+    line_number = 0
+    while True:
+        line_number += 1
+        stamp = (f"[2024.01.01-{line_number // 3600000 % 24:02d}.{line_number // 60000 % 60:02d}."
+                 f"{line_number // 1000 % 60:02d}.{line_number % 1000:03d}][{line_number % 1000:3d}]")
+        if rng.random() >= hit_density:
+            yield stamp + rng.choice(FILLER_LINES).format(n=line_number)
+            continue
+
+        blueprint = missing_blueprint(rng.randrange(blueprints))
+        error = f"LogStreaming:Error: Couldn't find file for package {blueprint} requested by async loading code."
+        shape = rng.randrange(3)
+        if shape == 0:  # standard_error: the warning follows within 5 lines
+            yield stamp + error
+            for _ in range(rng.randrange(4)):
+                yield stamp + rng.choice(FILLER_LINES).format(n=line_number)
+            yield stamp + STRING_ASSET_WARNING
+        elif shape == 1:  # async_loading: the error on its own
+            yield stamp + error
+        else:  # nametoload: NameToLoad, any line, then the warning
+            yield stamp + f"LogUObjectGlobals: NameToLoad: {blueprint}.{blueprint.rsplit('/', 1)[1]}_C"
+            yield stamp + FILLER_LINES[-1]
+            yield stamp + STRING_ASSET_WARNING
+
+def create_log(path: str, size_bytes: int, blueprints: int, hit_density: float, seed: int = 0) -> int:
+    """Write a synthetic ConanSandbox.log of about size_bytes (CRLF, like the server) and return its size."""
+    rng = random.Random(seed)
+    written = 0
+    batch = []
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as file:
+        for line in log_lines(rng, blueprints, hit_density):
+            batch.append(line)
+            written += len(line) + 2
+            if len(batch) == 10000 or written >= size_bytes:
+                file.write("\n".join(batch) + "\n")
+                batch = []
+                if written >= size_bytes:
+                    break
+    return os.path.getsize(path)
+
+def create_game_db(path: str, actors: int, blueprints: int, orphan_share: float, seed: int = 0,
+                   object_graph: bool = False) -> List[str]:
+    """Create a synthetic game.db and return the blueprint paths of its orphaned classes.
+
+    Rows are streamed into the tables, so millions of actors don't need to fit in memory.
+    With `object_graph` every fifth actor also gets inventory items with properties,
+    a follower marker as a thrall of player 1, and destruction history.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    missing = [missing_blueprint(index) for index in range(blueprints)]
+    valid = [f"/Game/Systems/Building/Placeables/BP_Valid{index}" for index in range(200)]
+
+    def actor_rows() -> Iterator[tuple]:
+        for object_id in range(1, actors + 1):
+            blueprint = rng.choice(missing) if missing and rng.random() < orphan_share else rng.choice(valid)
+            yield f"{blueprint}.{blueprint.rsplit('/', 1)[1]}_C", "ConanSandbox", object_id
+
+    def building_ids() -> Iterator[tuple]:
+        building_rng = random.Random(seed + 1)  # Same ids for both tables
+        return ((object_id,) for object_id in range(1, actors + 1) if building_rng.random() < 0.7)
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF;")
+    connection.execute("PRAGMA synchronous = OFF;")
+    connection.executescript(GAME_DB_SCHEMA)
+    connection.executemany("INSERT INTO actor_position VALUES (?, ?, ?, 0, 0, 0, 1, 1, 1, 0, 0, 0, 1)", actor_rows())
+    connection.executemany("INSERT INTO properties VALUES (?, 'BuildableHealth', zeroblob(24))",
+                           ((object_id,) for object_id in range(1, actors + 1)))
+    connection.executemany("INSERT INTO buildings VALUES (?, 1)", building_ids())
+    connection.executemany("INSERT INTO buildable_health VALUES (?, 0, 0, 1.0)", building_ids())
+    if object_graph:
+        containers = range(5, actors + 1, 5)
+        connection.executescript(OBJECT_GRAPH_SCHEMA)
+        connection.executemany("INSERT INTO item_inventory VALUES (?, ?, 4, 10001, zeroblob(200))",
+                               ((item_id, owner_id) for owner_id in containers for item_id in range(8)))
+        connection.executemany("INSERT INTO item_properties VALUES (?, ?, 4, 'Durability', zeroblob(16))",
+                               ((item_id, owner_id) for owner_id in containers for item_id in range(8)))
+        # Every container actor doubles as a thrall with a marker owned by player 1
+        connection.executemany("INSERT INTO follower_markers VALUES (1, ?, 0, 0, 0)",
+                               ((follower_id,) for follower_id in containers))
+        connection.executemany("INSERT INTO destruction_history VALUES (?, 'BP_Valid', 1, 0)",
+                               ((object_id,) for object_id in containers))
+    connection.commit()
+    connection.close()
+    return missing
+
+def table_names(connection: sqlite3.Connection) -> List[str]:
+    return [name for name, in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+def table_counts(path: str) -> Dict[str, int]:
+    connection = sqlite3.connect(path)
+    try:
+        return {
+            table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in table_names(connection)
+        }
+    finally:
+        connection.close()
+
+def load_seconds(path: str, repeats: int = 5) -> float:
+    """Time for a new connection to read every row of every table, as the server does at startup.
+
+    The best of `repeats` reads is kept, so a busy moment doesn't skew the comparison.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        connection = sqlite3.connect(path)
+        try:
+            for table in table_names(connection):
+                for _ in connection.execute(f"SELECT * FROM {table}"):
+                    pass
+        finally:
+            connection.close()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings), 3)
+
+def measure(stage, *args) -> Dict:
+    """Run a stage quietly and add its wall time and peak RSS, of the process and of its scan workers."""
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = stage(*args)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["peak_rss_bytes"] = peak_rss_bytes()
+    result["workers_peak_rss_bytes"] = peak_rss_bytes(children=True)
+    return result
+
+def run_isolated(stage, *args) -> Dict:
+    """Measure a stage in a fresh process, so the peak RSS belongs to that stage alone."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(measure, stage, *args).result()
+
+def stage_extract(log_file: str, pattern: str, workers: int) -> Dict:
+    fixer = BlueprintFixer(Config(selected_pattern=pattern, workers=workers))
+    fixer.extract_blueprints(log_file)
+    return {"blueprints": len(fixer.blueprint_paths), "matches": dict(fixer.error_sources)}
+
+def stage_generate(blueprint_paths: List[str], plan: str, output_file: str) -> Dict:
+    fixer = BlueprintFixer(Config(output_file=output_file, cleanup_plan=plan))
+    fixer.blueprint_paths = set(blueprint_paths)
+    fixer.write_sql_file()
+    return {"statements": len(fixer.sql_statements), "script_bytes": os.path.getsize(output_file)}
+
+def stage_execute(db_file: str, blueprint_paths: List[str], plan: str, output_file: str, compaction: str) -> Dict:
+    """Run one cleanup plan through the in-process engine."""
+    fixer = BlueprintFixer(Config(database_file=db_file, output_file=output_file, cleanup_plan=plan,
+                                  compaction=compaction, integrity_check="none"))
+    fixer.blueprint_paths = set(blueprint_paths)
+    fixer.write_sql_file()
+    ok = fixer.execute_with_sqlite_module()
+    rows = sum(
+        count for sql, count in fixer.statement_results
+        if sql.startswith("DELETE FROM") and not sql.startswith("DELETE FROM temp.")
+    )
+    return {"ok": ok, "statements": len(fixer.sql_statements), "rows_deleted": rows, "rows_left": table_counts(db_file)}
+
+def bench_extract(args: argparse.Namespace, work_dir: str) -> Dict:
+    """Log scan throughput per pattern mode, serial and with --workers processes."""
+    log_file = os.path.join(work_dir, "ConanSandbox.log")
+    size = create_log(log_file, int(args.log_mb * 1e6), args.blueprints, args.hit_density, args.seed)
+    print(f"Created synthetic ConanSandbox.log of {size / 1e6:.1f} MB")
+    results = []
+    for pattern in ("standard_error", "async_loading", "nametoload", "all"):
+        for workers in sorted({1, args.workers}):
+            result = run_isolated(stage_extract, log_file, pattern, workers)
+            result.update(pattern=pattern, workers=workers, mb_per_second=round(size / 1e6 / max(result["seconds"], 1e-9), 1))
+            results.append(result)
+            print(f"extract {pattern:>14} x{workers}: {result['seconds']:.3f}s, {result['mb_per_second']} MB/s")
+    return {"log_bytes": size, "hit_density": args.hit_density, "results": results}
+
+def bench_generate(args: argparse.Namespace, work_dir: str) -> Dict:
+    """Time to build and write CleanUpScript.sql for each cleanup plan."""
+    blueprint_paths = [missing_blueprint(index) for index in range(args.blueprints)]
+    results = []
+    for plan in ("per_blueprint", "set"):
+        result = run_isolated(stage_generate, blueprint_paths, plan, os.path.join(work_dir, f"{plan}.sql"))
+        result.update(plan=plan, blueprints_per_second=round(len(blueprint_paths) / max(result["seconds"], 1e-9), 1))
+        results.append(result)
+        print(f"generate {plan:>13}: {result['seconds']:.3f}s, {result['statements']} statements")
+    return {"blueprints": args.blueprints, "results": results}
+
+def bench_execute(args: argparse.Namespace, work_dir: str) -> Dict:
+    """Compare the cleanup plans, with and without compaction, on copies of the same game.db."""
+    source_db = os.path.join(work_dir, "game.db")
+    start = time.perf_counter()
+    blueprint_paths = create_game_db(source_db, args.actors, args.blueprints, args.orphan_share, args.seed)
+    print(f"Created synthetic game.db with {args.actors:,} actors in {time.perf_counter() - start:.1f}s")
+    runs = [("per_blueprint", "none"), ("set", "none"), ("set", "auto")]
+    if args.actors * args.blueprints > 10 ** 9:
+        runs.remove(("per_blueprint", "none"))  # One table scan per DELETE, would run for hours
+    results = []
+    for plan, compaction in runs:
+        db_file = os.path.join(work_dir, f"game_{plan}_{compaction}.db")
+        shutil.copyfile(source_db, db_file)
+        result = run_isolated(stage_execute, db_file, blueprint_paths, plan,
+                              os.path.join(work_dir, f"{plan}.sql"), compaction)
+        result.update(plan=plan, compaction=compaction, db_bytes_after=os.path.getsize(db_file),
+                      rows_per_second=round(result["rows_deleted"] / max(result["seconds"], 1e-9)))
+        results.append(result)
+        os.remove(db_file)
+        print(f"execute {plan:>14} compaction={compaction}: {result['seconds']:.3f}s, {result['rows_deleted']:,} rows")
+    return {
+        "actors": args.actors,
+        "blueprints": args.blueprints,
+        "orphan_share": args.orphan_share,
+        "db_bytes": os.path.getsize(source_db),
+        "rows_before": table_counts(source_db),
+        "results": results,
+        "same_rows_left": len({json.dumps(result["rows_left"], sort_keys=True) for result in results}) == 1,
+    }
+
+def bench_orphan_graph(args: argparse.Namespace, work_dir: str) -> Dict:
+    """Database size and load time after the set plan and after the graph plan, both compacted."""
+    source_db = os.path.join(work_dir, "game_graph.db")
+    blueprint_paths = create_game_db(source_db, args.actors, args.blueprints, args.orphan_share, args.seed,
+                                     object_graph=True)
+    print(f"Created synthetic game.db with {args.actors:,} actors and item tables")
+    before = {"db_bytes": os.path.getsize(source_db), "load_seconds": load_seconds(source_db),
+              "rows": table_counts(source_db)}
+    print(f"orphan_graph {'before':>6}: {before['db_bytes'] / 1e6:.1f} MB, load {before['load_seconds']:.3f}s")
+    results = []
+    for plan in ("set", "graph"):
+        db_file = os.path.join(work_dir, f"game_graph_{plan}.db")
+        shutil.copyfile(source_db, db_file)
+        result = run_isolated(stage_execute, db_file, blueprint_paths, plan,
+                              os.path.join(work_dir, f"graph_{plan}.sql"), "vacuum_into")
+        result.update(plan=plan, db_bytes_after=os.path.getsize(db_file), load_seconds=load_seconds(db_file),
+                      db_bytes_saved=before["db_bytes"] - os.path.getsize(db_file))
+        results.append(result)
+        for leftover in glob.glob(db_file + "*"):
+            os.remove(leftover)
+        print(f"orphan_graph {plan:>6}: {result['db_bytes_after'] / 1e6:.1f} MB, load {result['load_seconds']:.3f}s, "
+              f"{result['rows_deleted']:,} rows in {result['seconds']:.3f}s")
+    os.remove(source_db)
+    return {"actors": args.actors, "blueprints": args.blueprints, "orphan_share": args.orphan_share,
+            "before": before, "results": results}
+
+BENCHMARKS = {
+    "extract": bench_extract,
+    "generate": bench_generate,
+    "execute": bench_execute,
+    "orphan_graph": bench_orphan_graph,
+}
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks for DBFixResavingPackage on synthetic data")
+    parser.add_argument('--stages', default=",".join(STAGES), help="Comma separated stages: extract, generate, execute, orphan_graph")
+    parser.add_argument('--log-mb', type=float, default=100, help="Size of the synthetic log in MB")
+    parser.add_argument('--hit-density', type=float, default=0.01, help="Share of log lines that start an error")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes for the parallel log scan")
+    parser.add_argument('--actors', type=int, default=200000, help="Rows in actor_position")
+    parser.add_argument('--blueprints', type=int, default=100, help="Number of missing blueprints")
+    parser.add_argument('--orphan-share', type=float, default=0.05, help="Share of actors using a missing blueprint")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='FILE', help="Write results as JSON")
+    args = parser.parse_args()
+    unknown = set(args.stages.split(",")) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    return args
+
+def main():
+    args = parse_args()
+    results = {
+        "version": tool_version(),
+        "created": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for stage in args.stages.split(","):
+            results[stage] = BENCHMARKS[stage](args, work_dir)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
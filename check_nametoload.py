@@ -0,0 +1,92 @@
+import os
+import re
+import sys
+import random
+import argparse
+import tempfile
+from typing import List, Tuple
+
+from DBFixResavingPackage import Config, scan_log_file
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression", "nametoload")
+
+# Line pieces the randomized logs are built from, including the awkward ones:
+# several timestamps on a line, repeated anchors, text after "slow." and empty paths
+PIECES = [
+    "[2024.01.01-10.00.00.123][  1]",
+    "[2024.1.1-1.2.3.4]",
+    "LogStreaming:Warning: Async loading",
+    " NameToLoad: /Game/Mods/Pippi/BP_Chest",
+    " NameToLoad: /Game/Mods/EEWA/BP_Wall.BP_Wall_C",
+    " NameToLoad: ",
+    " NameToLoad:",
+    'LogPackageName:Warning: String asset reference "None" is in short form',
+    ' String asset reference "None"',
+    " resolving it will be really slow.",
+    " slow.",
+    "slow",
+    "LogPackageName:Warning: Please consider resaving package in order to speed-up loading.",
+    "LogNet: filler",
+    "   ",
+    "",
+]
+
+def reference_matches(log_file: str) -> List[str]:
+    """Paths the original C# regex finds, read the way the original script read the log."""
+    with open(log_file, 'r', encoding='utf-8', errors='ignore') as file:
+        content = file.read()
+    pattern = Config().error_patterns['nametoload']
+    paths = []
+    for match in re.finditer(pattern, content, re.MULTILINE):
+        blueprint_path = match.group(1).strip().replace('\r', '')
+        if blueprint_path:
+            paths.append(blueprint_path)
+    return paths
+
+def check_log(log_file: str) -> Tuple[bool, str]:
+    expected = reference_matches(log_file)
+    paths, sources, _ = scan_log_file(log_file, Config().error_patterns, ['nametoload'], 64 * 1024)
+    if paths == set(expected) and sources['nametoload'] == len(expected):
+        return True, f"{len(expected)} matches"
+    return False, (f"expected {len(expected)} matches {sorted(set(expected))}, "
+                   f"got {sources['nametoload']} matches {sorted(paths)}")
+
+def random_log(path: str, rng: random.Random, lines: int) -> None:
+    newline = rng.choice(["\n", "\r\n"])
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        for _ in range(lines):
+            file.write("".join(rng.choice(PIECES) for _ in range(rng.randint(0, 5))) + newline)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check that the NameToLoad line matcher finds what the original regex finds")
+    parser.add_argument('--random', type=int, default=0, metavar='N', help="Also check N randomized logs")
+    parser.add_argument('--lines', type=int, default=200, help="Lines per randomized log")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    failures = 0
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        ok, message = check_log(os.path.join(CORPUS_DIR, name))
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {message}")
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for index in range(args.random):
+            log_file = os.path.join(work_dir, f"random-{index}.log")
+            random_log(log_file, rng, args.lines)
+            ok, message = check_log(log_file)
+            if not ok:
+                failures += 1
+                kept = os.path.join(os.getcwd(), f"nametoload-failure-{args.seed}-{index}.log")
+                os.replace(log_file, kept)
+                print(f"FAIL random log {index}, kept as {kept}: {message}")
+    if args.random:
+        print(f"{args.random} randomized logs checked")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()